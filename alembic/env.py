@@ -13,7 +13,8 @@ config = context.config
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
 if config.config_file_name is not None:
-    fileConfig(config.config_file_name)
+    #keep the app's loggers when migrating from inside a running process (src/bootstrap.py)
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
 
 # set sqlalchemy.url in alembic.ini to POSTGRES_DATABASE_URL
 config.set_section_option("alembic", "sqlalchemy.url", os.environ.get("POSTGRES_DATABASE_URL"))
@@ -24,6 +25,10 @@ config.set_section_option("alembic", "sqlalchemy.url", os.environ.get("POSTGRES_
 # from myapp import mymodel
 # target_metadata = mymodel.Base.metadata
 from src.database import Base
+#importing the models registers their tables on Base.metadata
+from src.book import models as book_models  # noqa: F401
+from src.loan import models as loan_models  # noqa: F401
+from src.user import models as user_models  # noqa: F401
 target_metadata = Base.metadata
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
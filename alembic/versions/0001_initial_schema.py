@@ -0,0 +1,72 @@
+"""initial schema
+
+Revision ID: 0001
+Revises: 
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'user',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('email', sa.String(), nullable=False),
+        sa.Column('name', sa.String(length=64), nullable=False),
+        sa.Column('age', sa.Integer(), nullable=False),
+        sa.Column('status', sa.Enum('SUPERUSER', 'ADMIN', 'USER', name='userstatus'), nullable=False),
+        sa.Column('registered_date', sa.Date(), nullable=False),
+        sa.Column('hashed_password', sa.String(), nullable=False),
+        sa.Column('is_active', sa.Boolean(), nullable=False),
+        sa.Column('is_borrower', sa.Boolean(), nullable=False),
+        sa.Column('is_member', sa.Boolean(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('id'),
+    )
+    op.create_index('ix_user_email', 'user', ['email'], unique=True)
+
+    op.create_table(
+        'book',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('title', sa.String(length=64), nullable=False),
+        sa.Column('author', sa.String(length=64), nullable=False),
+        sa.Column('isbn', sa.String(length=13), nullable=False),
+        sa.Column('edition', sa.String(length=64), nullable=True),
+        sa.Column('publisher', sa.String(length=64), nullable=True),
+        sa.Column('publish_date', sa.String(length=64), nullable=True),
+        sa.Column('publish_place', sa.String(length=64), nullable=True),
+        sa.Column('number_of_pages', sa.String(), nullable=True),
+        sa.Column('description', sa.String(length=1024), nullable=True),
+        sa.Column('language', sa.String(length=32), nullable=True),
+        sa.Column('lccn', sa.String(length=64), nullable=True),
+        sa.Column('subtitle', sa.String(length=1024), nullable=True),
+        sa.Column('subjects', sa.String(length=256), nullable=True),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('added_date', sa.Date(), nullable=False),
+        sa.Column('borrowed_date', sa.Date(), nullable=True),
+        sa.Column('returned_date', sa.Date(), nullable=True),
+        sa.Column('is_borrowed', sa.Boolean(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('id'),
+    )
+    op.create_index('ix_book_title_id', 'book', ['title', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_book_title_id', table_name='book')
+    op.drop_table('book')
+    op.drop_index('ix_user_email', table_name='user')
+    op.drop_table('user')
+    sa.Enum(name='userstatus').drop(op.get_bind(), checkfirst=True)
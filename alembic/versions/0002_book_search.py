@@ -0,0 +1,72 @@
+"""book full-text search
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+POSTGRES_UPGRADE = [
+    """ALTER TABLE book ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(author, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(subtitle, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(subjects, '')), 'C') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'D')
+    ) STORED""",
+    "CREATE INDEX ix_book_search_vector ON book USING GIN (search_vector)",
+]
+
+SQLITE_UPGRADE = [
+    """CREATE VIRTUAL TABLE book_fts USING fts5(
+        title, author, subtitle, subjects, description, content='book', content_rowid='id'
+    )""",
+    """CREATE TRIGGER book_fts_ai AFTER INSERT ON book BEGIN
+        INSERT INTO book_fts(rowid, title, author, subtitle, subjects, description)
+        VALUES (new.id, new.title, new.author, new.subtitle, new.subjects, new.description);
+    END""",
+    """CREATE TRIGGER book_fts_ad AFTER DELETE ON book BEGIN
+        INSERT INTO book_fts(book_fts, rowid, title, author, subtitle, subjects, description)
+        VALUES ('delete', old.id, old.title, old.author, old.subtitle, old.subjects, old.description);
+    END""",
+    """CREATE TRIGGER book_fts_au AFTER UPDATE OF title, author, subtitle, subjects, description ON book BEGIN
+        INSERT INTO book_fts(book_fts, rowid, title, author, subtitle, subjects, description)
+        VALUES ('delete', old.id, old.title, old.author, old.subtitle, old.subjects, old.description);
+        INSERT INTO book_fts(rowid, title, author, subtitle, subjects, description)
+        VALUES (new.id, new.title, new.author, new.subtitle, new.subjects, new.description);
+    END""",
+    #index rows that existed before the migration
+    "INSERT INTO book_fts(book_fts) VALUES ('rebuild')",
+]
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        for statement in POSTGRES_UPGRADE:
+            op.execute(statement)
+    elif dialect == 'sqlite':
+        for statement in SQLITE_UPGRADE:
+            op.execute(statement)
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_book_search_vector")
+        op.execute("ALTER TABLE book DROP COLUMN IF EXISTS search_vector")
+    elif dialect == 'sqlite':
+        for trigger in ('book_fts_ai', 'book_fts_ad', 'book_fts_au'):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS book_fts")
@@ -0,0 +1,33 @@
+"""book and user version columns
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('book', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+    op.add_column('user', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('user') as batch_op:
+        batch_op.drop_column('version')
+    if op.get_bind().dialect.name == 'sqlite':
+        #a batch alter would recreate the table and lose the search triggers, SQLite >= 3.35 drops columns in place
+        op.execute('ALTER TABLE book DROP COLUMN version')
+    else:
+        op.drop_column('book', 'version')
@@ -0,0 +1,42 @@
+"""unique book isbn, integer number_of_pages
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    #fails if the table already holds duplicate isbns, merge those rows first
+    op.create_index('ix_book_isbn', 'book', ['isbn'], unique=True)
+    #schemas.BookCreate has always sent an integer here; SQLite columns aren't strictly typed and a
+    #batch alter would recreate the table, dropping the full text search triggers from 0002
+    if op.get_bind().dialect.name == 'sqlite':
+        return
+    with op.batch_alter_table('book') as batch_op:
+        batch_op.alter_column(
+            'number_of_pages',
+            existing_type=sa.String(),
+            type_=sa.Integer(),
+            existing_nullable=True,
+            postgresql_using='number_of_pages::integer',
+        )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'sqlite':
+        with op.batch_alter_table('book') as batch_op:
+            batch_op.alter_column('number_of_pages', existing_type=sa.Integer(), type_=sa.String(), existing_nullable=True)
+    op.drop_index('ix_book_isbn', table_name='book')
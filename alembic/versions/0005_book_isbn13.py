@@ -0,0 +1,66 @@
+"""normalized, indexed book isbn13
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_BATCH_SIZE = 1000
+
+
+#frozen copy of src/book/isbn.normalize, migrations must not change when the app code does
+def _isbn13(value):
+    value = (value or '').replace('-', '').replace(' ', '').upper()
+    if len(value) == 10 and value[:9].isdigit() and (value[9].isdigit() or value[9] == 'X'):
+        digits = [int(character) for character in value[:9]] + [10 if value[9] == 'X' else int(value[9])]
+        if sum(weight * digit for weight, digit in zip(range(10, 0, -1), digits)) % 11 != 0:
+            return None
+        value = '978' + value[:9]
+        return value + str((10 - sum(int(digit) * (3 if index % 2 else 1) for index, digit in enumerate(value)) % 10) % 10)
+    if len(value) == 13 and value.isdigit():
+        check = (10 - sum(int(digit) * (3 if index % 2 else 1) for index, digit in enumerate(value[:12])) % 10) % 10
+        return value if str(check) == value[12] else None
+    return None
+
+
+def upgrade() -> None:
+    op.add_column('book', sa.Column('isbn13', sa.String(length=13), nullable=True))
+
+    connection = op.get_bind()
+    rows = connection.execute(sa.text('SELECT id, isbn FROM book ORDER BY id')).all()
+    #when both spellings of one book are stored, the oldest row keeps isbn13 and the newer one
+    #stays reachable by its id; invalid isbns stay NULL
+    seen = set()
+    updates = []
+    for book_id, isbn in rows:
+        isbn13 = _isbn13(isbn)
+        if isbn13 and isbn13 not in seen:
+            seen.add(isbn13)
+            updates.append({'id': book_id, 'isbn13': isbn13})
+
+    statement = sa.text('UPDATE book SET isbn13 = :isbn13 WHERE id = :id')
+    for start in range(0, len(updates), BACKFILL_BATCH_SIZE):
+        connection.execute(statement, updates[start:start + BACKFILL_BATCH_SIZE])
+
+    op.create_index('ix_book_isbn13', 'book', ['isbn13'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_book_isbn13', table_name='book')
+    if op.get_bind().dialect.name == 'sqlite':
+        #a batch alter would recreate the table and lose the search triggers, SQLite >= 3.35 drops columns in place
+        op.execute('ALTER TABLE book DROP COLUMN isbn13')
+    else:
+        op.drop_column('book', 'isbn13')
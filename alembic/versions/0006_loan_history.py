@@ -0,0 +1,94 @@
+"""loan history and circulation counters
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'loan',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('book_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('borrowed_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('returned_at', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['book_id'], ['book.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_loan_book_id_borrowed_at', 'loan', ['book_id', 'borrowed_at', 'id'], unique=False)
+    op.create_index('ix_loan_user_id_borrowed_at', 'loan', ['user_id', 'borrowed_at', 'id'], unique=False)
+    op.create_index(
+        'ix_loan_open_book_id', 'loan', ['book_id'], unique=True,
+        postgresql_where=sa.text('returned_at IS NULL'), sqlite_where=sa.text('returned_at IS NULL'),
+    )
+
+    op.create_table(
+        'book_loan_stats',
+        sa.Column('book_id', sa.Integer(), nullable=False),
+        sa.Column('loan_count', sa.Integer(), nullable=False),
+        sa.Column('is_on_loan', sa.Boolean(), nullable=False),
+        sa.Column('last_borrowed_at', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['book_id'], ['book.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('book_id'),
+    )
+    op.create_index('ix_book_loan_stats_loan_count', 'book_loan_stats', ['loan_count', 'book_id'], unique=False)
+
+    op.create_table(
+        'user_loan_stats',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('loan_count', sa.Integer(), nullable=False),
+        sa.Column('active_loans', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id'),
+    )
+    op.create_index('ix_user_loan_stats_active_loans', 'user_loan_stats', ['active_loans', 'user_id'], unique=False)
+
+    op.create_table(
+        'daily_loan_stats',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('borrowed', sa.Integer(), nullable=False),
+        sa.Column('returned', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('day'),
+    )
+
+    #earlier loans left no history, only the ones still open are known: one loan each,
+    #dated at midnight of the stored borrowed_date
+    op.execute(
+        "INSERT INTO loan (book_id, user_id, borrowed_at) "
+        "SELECT id, user_id, COALESCE(borrowed_date, added_date) FROM book WHERE is_borrowed AND user_id IS NOT NULL"
+    )
+    op.execute(
+        "INSERT INTO book_loan_stats (book_id, loan_count, is_on_loan, last_borrowed_at) "
+        "SELECT book_id, 1, TRUE, borrowed_at FROM loan"
+    )
+    op.execute(
+        "INSERT INTO user_loan_stats (user_id, loan_count, active_loans) "
+        "SELECT user_id, COUNT(*), COUNT(*) FROM loan GROUP BY user_id"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('daily_loan_stats')
+    op.drop_index('ix_user_loan_stats_active_loans', table_name='user_loan_stats')
+    op.drop_table('user_loan_stats')
+    op.drop_index('ix_book_loan_stats_loan_count', table_name='book_loan_stats')
+    op.drop_table('book_loan_stats')
+    op.drop_index('ix_loan_open_book_id', table_name='loan')
+    op.drop_index('ix_loan_user_id_borrowed_at', table_name='loan')
+    op.drop_index('ix_loan_book_id_borrowed_at', table_name='loan')
+    op.drop_table('loan')
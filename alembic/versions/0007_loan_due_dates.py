@@ -0,0 +1,49 @@
+"""loan due dates and overdue reminders
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+#LOAN_PERIOD_DAYS default when this revision was written
+LOAN_PERIOD_DAYS = 21
+BACKFILL_BATCH_SIZE = 1000
+
+
+def upgrade() -> None:
+    op.add_column('loan', sa.Column('due_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('loan', sa.Column('notified_at', sa.DateTime(timezone=True), nullable=True))
+
+    #open loans get a due date counted from when they started, interval arithmetic differs per dialect
+    loan = sa.table('loan', sa.column('id', sa.Integer()), sa.column('borrowed_at', sa.DateTime(timezone=True)), sa.column('returned_at'), sa.column('due_at'))
+    connection = op.get_bind()
+    rows = connection.execute(sa.select(loan.c.id, loan.c.borrowed_at).where(loan.c.returned_at.is_(None))).all()
+    updates = [{'loan_id': loan_id, 'due': borrowed_at + datetime.timedelta(days=LOAN_PERIOD_DAYS)} for loan_id, borrowed_at in rows]
+    statement = loan.update().where(loan.c.id == sa.bindparam('loan_id')).values(due_at=sa.bindparam('due'))
+    for start in range(0, len(updates), BACKFILL_BATCH_SIZE):
+        connection.execute(statement, updates[start:start + BACKFILL_BATCH_SIZE])
+
+    op.create_index(
+        'ix_loan_open_due_at', 'loan', ['due_at', 'id'], unique=False,
+        postgresql_where=sa.text('returned_at IS NULL'), sqlite_where=sa.text('returned_at IS NULL'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_loan_open_due_at', table_name='loan')
+    with op.batch_alter_table('loan') as batch_op:
+        batch_op.drop_column('notified_at')
+        batch_op.drop_column('due_at')
@@ -0,0 +1,30 @@
+"""book cover hash
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0008'
+down_revision: Union[str, None] = '0007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('book', sa.Column('cover_hash', sa.String(length=64), nullable=True))
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == 'sqlite':
+        #a batch alter would recreate the table and lose the search triggers, SQLite >= 3.35 drops columns in place
+        op.execute('ALTER TABLE book DROP COLUMN cover_hash')
+    else:
+        op.drop_column('book', 'cover_hash')
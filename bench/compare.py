@@ -0,0 +1,44 @@
+"""Compare two bench/run.py results, e.g. the base branch against a release candidate:
+
+    python -m bench.compare base.json head.json --threshold 10
+
+Exits with status 1 when any scenario's p95 latency or throughput regressed by more than threshold percent.
+"""
+import argparse
+import json
+import sys
+
+def change(base: float, head: float) -> float:
+    return (head - base) / base * 100 if base else 0.0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bench.compare")
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument("--threshold", type=float, default=10.0, help="allowed regression in percent")
+    args = parser.parse_args(argv)
+
+    with open(args.base, encoding="utf-8") as stream:
+        base = json.load(stream)["scenarios"]
+    with open(args.head, encoding="utf-8") as stream:
+        head = json.load(stream)["scenarios"]
+
+    regressed = False
+    print(f"{'scenario':<20} {'p95 ms':>20} {'rps':>22} {'sql/req':>14}")
+    for name in sorted(base.keys() & head.keys()):
+        before, after = base[name], head[name]
+        p95_change = change(before["latency_ms"]["p95"], after["latency_ms"]["p95"])
+        rps_change = change(before["throughput_rps"], after["throughput_rps"])
+        print(
+            f"{name:<20} {before['latency_ms']['p95']:>8.2f} -> {after['latency_ms']['p95']:<8.2f}"
+            f" {before['throughput_rps']:>9.1f} -> {after['throughput_rps']:<9.1f}"
+            f" {before['sql_statements_per_request']:>5.1f} -> {after['sql_statements_per_request']:<5.1f}"
+        )
+        if p95_change > args.threshold or -rps_change > args.threshold:
+            regressed = True
+            print(f"  regression: p95 {p95_change:+.1f}%, throughput {rps_change:+.1f}%")
+
+    return 1 if regressed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
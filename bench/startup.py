@@ -0,0 +1,81 @@
+"""Cold start regression check.
+
+Imports the app and runs its startup in fresh interpreters, the way an autoscaled worker starts,
+and fails when the median import or startup time exceeds its budget, or when importing the app
+loads a database driver or Alembic (those belong to the lifespan and to src/bootstrap.py):
+
+    python -m bench.startup --max-import-ms 1500 --max-startup-ms 300
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+#modules that must not be loaded by a bare "import src.main"
+LAZY_MODULES = ("psycopg2", "asyncpg", "aiosqlite", "alembic")
+
+#runs in the child interpreter, prints one JSON line
+PROBE = """
+import asyncio, json, sys, time
+start = time.perf_counter()
+from src.main import app
+imported = time.perf_counter()
+loaded = [name for name in {lazy_modules!r} if name in sys.modules]
+
+async def startup():
+    async with app.router.lifespan_context(app):
+        return time.perf_counter()
+
+started = asyncio.run(startup())
+print(json.dumps({{"import_ms": (imported - start) * 1000, "startup_ms": (started - imported) * 1000, "loaded": loaded}}))
+"""
+
+def probe(database_url: str) -> dict:
+    environment = {
+        **os.environ,
+        #nothing listens on port 1: startup must succeed without opening a connection
+        "POSTGRES_DATABASE_URL": database_url,
+        "DB_MIGRATE_ON_STARTUP": "false",
+        "SECRET_KEY": os.environ.get("SECRET_KEY", "startup-check"),
+        #read at import by src/auth/service.py, same defaults as bench/run.py
+        "HASH_ALGORITHM": os.environ.get("HASH_ALGORITHM", "pbkdf2_sha256"),
+        "JWT_ALGORITHM": os.environ.get("JWT_ALGORITHM", "HS256"),
+        "OPENLIBRARY_CACHE_PATH": "",
+    }
+    completed = subprocess.run(
+        [sys.executable, "-c", PROBE.format(lazy_modules=LAZY_MODULES)],
+        capture_output=True, text=True, env=environment, check=True,
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bench.startup", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-import-ms", type=float, default=1500.0)
+    parser.add_argument("--max-startup-ms", type=float, default=300.0)
+    parser.add_argument("--database-url", default="postgresql://startup-check@127.0.0.1:1/startup_check")
+    args = parser.parse_args(argv)
+
+    runs = [probe(args.database_url) for _ in range(args.runs)]
+    result = {
+        "import_ms": round(statistics.median(run["import_ms"] for run in runs), 1),
+        "startup_ms": round(statistics.median(run["startup_ms"] for run in runs), 1),
+        "eagerly_loaded": sorted({name for run in runs for name in run["loaded"]}),
+    }
+    print(json.dumps(result, indent=2))
+
+    failures = []
+    if result["import_ms"] > args.max_import_ms:
+        failures.append(f"import took {result['import_ms']} ms, budget {args.max_import_ms} ms")
+    if result["startup_ms"] > args.max_startup_ms:
+        failures.append(f"startup took {result['startup_ms']} ms, budget {args.max_startup_ms} ms")
+    if result["eagerly_loaded"]:
+        failures.append(f"importing the app loaded {', '.join(result['eagerly_loaded'])}")
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,4 +2,19 @@ import os
 
 HASH_ALGORITHM = os.environ.get("HASH_ALGORITHM")
 JWT_ALGORITHM = os.environ.get("JWT_ALGORITHM")
-SECRET_KEY = os.environ.get("SECRET_KEY")
\ No newline at end of file
+SECRET_KEY = os.environ.get("SECRET_KEY")
+
+#previous algorithms still accepted at login, matching hashes are upgraded to HASH_ALGORITHM
+HASH_LEGACY_ALGORITHMS = [name for name in os.environ.get("HASH_LEGACY_ALGORITHMS", "").split(",") if name]
+#cost parameter of HASH_ALGORITHM (bcrypt log rounds, argon2 time cost...), hashes made with another cost are upgraded at login
+HASH_ROUNDS = int(os.environ["HASH_ROUNDS"]) if os.environ.get("HASH_ROUNDS") else None
+#"thread" suits backends that release the GIL (bcrypt, argon2-cffi), "process" the pure python ones
+HASH_EXECUTOR = os.environ.get("HASH_EXECUTOR", "thread")
+HASH_WORKERS = int(os.environ.get("HASH_WORKERS", os.cpu_count() or 1))
+#hash operations allowed to wait for a worker before new ones are rejected with 503
+HASH_MAX_PENDING = int(os.environ.get("HASH_MAX_PENDING", 64))
+
+#revoked token ids are persisted here so logouts survive restarts, empty keeps them in memory only
+REVOCATION_FILE = os.environ.get("REVOCATION_FILE", ".cache/revoked_tokens.json")
+#seconds between saves of the revocation set, also how quickly workers sharing the file see each other's logouts
+REVOCATION_PERSIST_INTERVAL = float(os.environ.get("REVOCATION_PERSIST_INTERVAL", 30))
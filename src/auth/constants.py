@@ -1,2 +1,6 @@
 ACCESS_TOKEN_EXPIRE_WEEKS = 1 
-REFRESH_TOKEN_EXPIRE_WEEKS = 26
\ No newline at end of file
+REFRESH_TOKEN_EXPIRE_WEEKS = 26
+
+#verified token claims kept in memory, entries never outlive the token's own exp
+VERIFIED_TOKEN_CACHE_SIZE = 10000
+VERIFIED_TOKEN_CACHE_TTL_SECONDS = 300
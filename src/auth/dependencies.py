@@ -1,65 +1,97 @@
 
+import hashlib
 from typing import Annotated
 
 import jwt
-from fastapi import Depends, HTTPException, Path
+from fastapi import Depends, HTTPException, Path, Request
 from fastapi.security import OAuth2PasswordBearer, SecurityScopes
 from jwt.exceptions import InvalidTokenError
 from pydantic import ValidationError
 from datetime import datetime, timezone
 
-from ..auth import config, exceptions
+from .. import cache
+from ..auth import config, constants, exceptions, revocation
 from ..user import schemas, crud
 
 oauth2_scheme = OAuth2PasswordBearer(
     tokenUrl="/api/token"
 )
 
-def authorize_current_user(security_scopes: SecurityScopes, token: Annotated[str, Depends(oauth2_scheme)]):
-    
-    if security_scopes.scopes:
-        authenticate_value = f'Bearer scope="{security_scopes.scope_str}"'
-    else:
-        authenticate_value = "Bearer"
+#sha256(token) -> verified JWTTokenData, repeat callers skip signature verification
+verified_tokens = cache.TTLCache(maxsize=constants.VERIFIED_TOKEN_CACHE_SIZE, ttl=constants.VERIFIED_TOKEN_CACHE_TTL_SECONDS)
 
-    try:
-        payload = jwt.decode(token, config.SECRET_KEY, config.JWT_ALGORITHM)
-        payload_email = payload.get("email")
-        payload_scope = payload.get("scope")
-        payload_expire = payload.get("exp")
+def _check_token(user_token_data: schemas.JWTTokenData, token_type: str) -> schemas.JWTTokenData:
+    if user_token_data.token_type != token_type:
+        raise InvalidTokenError(f"Not an {token_type} token")
+    #checked on cache hits too, a token revoked after being cached stops working at once
+    if user_token_data.jti in revocation.revoked_tokens:
+        raise InvalidTokenError("Token has been revoked")
+    return user_token_data
+
+def decode_token(token: str, token_type: str = "access") -> schemas.JWTTokenData:
+    """Verify token and return its claims, raises InvalidTokenError or ValidationError,
+    also when the token is of another type or has been revoked"""
+    token_hash = hashlib.sha256(token.encode()).digest()
+    now = datetime.now(tz=timezone.utc)
 
-        """JWT automatically convert datetime to timestamp when encode data,
-        it is necessary to convert timestamp type back to datetime type after decoding payload"""
-        payload_expire_datetime = datetime.fromtimestamp(payload_expire, tz=(timezone.utc))
+    user_token_data = verified_tokens.get(token_hash)
+    if user_token_data is not cache.MISSING and user_token_data.expire_date > now:
+        return _check_token(user_token_data, token_type)
 
-        user_token_data = schemas.JWTTokenData(email=payload_email, scope=payload_scope, expire_date=payload_expire_datetime)
+    #tokens issued before ids and types were added could neither be revoked nor told apart from
+    #refresh tokens, they are refused and their holders have to log in again
+    payload = jwt.decode(token, config.SECRET_KEY, config.JWT_ALGORITHM, options={"require": ["exp", "jti", "type"]})
+    payload_email = payload.get("email")
+    payload_scope = payload.get("scope")
+    payload_expire = payload.get("exp")
 
+    """JWT automatically convert datetime to timestamp when encode data,
+    it is necessary to convert timestamp type back to datetime type after decoding payload"""
+    payload_expire_datetime = datetime.fromtimestamp(payload_expire, tz=(timezone.utc))
+
+    user_token_data = schemas.JWTTokenData(
+        email=payload_email, scope=payload_scope, expire_date=payload_expire_datetime,
+        jti=payload["jti"], token_type=payload["type"],
+    )
+
+    #never cache past exp, the token must stop working exactly when it expires
+    ttl = min((payload_expire_datetime - now).total_seconds(), constants.VERIFIED_TOKEN_CACHE_TTL_SECONDS)
+    verified_tokens.set(token_hash, user_token_data, ttl=ttl)
+
+    return _check_token(user_token_data, token_type)
+
+#verified claims of the current request, decoded at most once per request
+def get_token_claims(request: Request, token: Annotated[str, Depends(oauth2_scheme)]) -> schemas.JWTTokenData:
+    user_token_data = getattr(request.state, "token_claims", None)
+    if user_token_data is not None:
+        return user_token_data
+
+    try:
+        user_token_data = decode_token(token)
     except (InvalidTokenError, ValidationError):
-        raise exceptions.credentials_exception("Could not validate credentials1", authenticate_value)
+        raise exceptions.credentials_exception("Could not validate credentials", "Bearer")
+
+    request.state.token_claims = user_token_data
+    return user_token_data
+
+def authorize_current_user(security_scopes: SecurityScopes, user_token_data: Annotated[schemas.JWTTokenData, Depends(get_token_claims)]):
+    
+    if security_scopes.scopes:
+        authenticate_value = f'Bearer scope="{security_scopes.scope_str}"'
+    else:
+        authenticate_value = "Bearer"
 
     #verifying permission
     if user_token_data.scope not in security_scopes.scopes:
         raise exceptions.credentials_exception("User doesn't have enough privilege", authenticate_value)
+
+    return user_token_data
         
 #verifying both identity and role
 #check either user is logged in as the user or user is admin or superuser
-def confirm_user_authorization(email: str, token: Annotated[str, Depends(oauth2_scheme)]):
-    try:
-        payload = jwt.decode(token, config.SECRET_KEY, config.JWT_ALGORITHM)
-        payload_email = payload.get("email")
-        payload_scope = payload.get("scope")
-        payload_expire = payload.get("exp")
-
-        """JWT automatically convert datetime to timestamp when encode data,
-        it is necessary to convert timestamp type back to datetime type after decoding payload"""
-        payload_expire_datetime = datetime.fromtimestamp(payload_expire, tz=(timezone.utc))
-
-        user_token_data = schemas.JWTTokenData(email=payload_email, scope=payload_scope, expire_date=payload_expire_datetime)
-        
-    except (InvalidTokenError, ValidationError):
-        raise HTTPException(status_code=401, detail="Could not validate credentials2")
-
+def confirm_user_authorization(email: str, user_token_data: Annotated[schemas.JWTTokenData, Depends(get_token_claims)]):
     # if current user's email doesn't match the email of the requested user, and current user's scope isn't admin or superuser
     if email != user_token_data.email and user_token_data.scope not in ["admin", "superuser"]:
         raise HTTPException(status_code=401, detail="Could not validate credentials3")
 
+    return user_token_data
@@ -4,4 +4,10 @@ def credentials_exception(error_detail: str, authenticate_value: str):
     return HTTPException(
         status_code = status.HTTP_401_UNAUTHORIZED,
         detail = error_detail,
-        headers = {"WWW-Authenticate": authenticate_value})
\ No newline at end of file
+        headers = {"WWW-Authenticate": authenticate_value})
+
+def hashing_overloaded_exception():
+    return HTTPException(
+        status_code = status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail = "Server is busy, please retry shortly",
+        headers = {"Retry-After": "1"})
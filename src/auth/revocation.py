@@ -0,0 +1,126 @@
+import asyncio
+import heapq
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from . import config
+
+"""Revoked token ids (jti), checked on every authenticated request.
+
+Membership is a dict lookup; a min-heap of expiry times lets expired ids be dropped from
+the front without scanning, since a token that expired can't be used anyway. The set is
+persisted to REVOCATION_FILE every REVOCATION_PERSIST_INTERVAL seconds: each save merges
+the file's entries first, so workers sharing the file pick up each other's revocations."""
+
+logger = logging.getLogger(__name__)
+
+class RevocationSet:
+    def __init__(self):
+        #jti -> exp timestamp
+        self._expiries: dict[str, float] = {}
+        self._heap: list[tuple[float, str]] = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._expiries)
+
+    def _purge(self, now: float):
+        while self._heap and self._heap[0][0] <= now:
+            expires_at, jti = heapq.heappop(self._heap)
+            #skip heap entries superseded by a later add of the same jti
+            if self._expiries.get(jti) == expires_at:
+                del self._expiries[jti]
+
+    def add(self, jti: str, expires_at: float):
+        if expires_at <= time.time():
+            return
+        with self._lock:
+            if self._expiries.get(jti, 0) >= expires_at:
+                return
+            self._expiries[jti] = expires_at
+            heapq.heappush(self._heap, (expires_at, jti))
+
+    def __contains__(self, jti: str) -> bool:
+        expires_at = self._expiries.get(jti)
+        return expires_at is not None and expires_at > time.time()
+
+    def purge(self):
+        with self._lock:
+            self._purge(time.time())
+
+    def snapshot(self) -> dict[str, float]:
+        with self._lock:
+            self._purge(time.time())
+            return dict(self._expiries)
+
+    def load(self, path: str):
+        """Merge the entries saved at path, a missing or unreadable file counts as empty"""
+        try:
+            with open(path, encoding="utf-8") as stream:
+                entries = json.load(stream)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError):
+            logger.exception("Could not read revoked tokens from %s", path)
+            return
+        for jti, expires_at in entries.items():
+            self.add(jti, float(expires_at))
+
+    def save(self, path: str):
+        """Merge the file's entries, then write the union atomically"""
+        self.load(path)
+        directory = os.path.dirname(path) or "."
+        os.makedirs(directory, exist_ok=True)
+        descriptor, temporary_path = tempfile.mkstemp(dir=directory)
+        try:
+            with os.fdopen(descriptor, "w", encoding="utf-8") as stream:
+                json.dump(self.snapshot(), stream, separators=(",", ":"))
+            os.replace(temporary_path, path)
+        except BaseException:
+            if os.path.exists(temporary_path):
+                os.unlink(temporary_path)
+            raise
+
+revoked_tokens = RevocationSet()
+
+class RevocationPersister:
+    """Loads REVOCATION_FILE on start, saves it every REVOCATION_PERSIST_INTERVAL seconds and on stop"""
+
+    def __init__(self, path: str | None = config.REVOCATION_FILE, interval: float = config.REVOCATION_PERSIST_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self._task = None
+
+    async def _save(self):
+        try:
+            await asyncio.to_thread(revoked_tokens.save, self.path)
+        except Exception:
+            #kept in memory, the next tick retries
+            logger.exception("Saving revoked tokens to %s failed", self.path)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self._save()
+
+    async def start(self):
+        if not self.path or self._task is not None:
+            return
+        await asyncio.to_thread(revoked_tokens.load, self.path)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            await self._save()
+
+persister = RevocationPersister()
@@ -3,10 +3,13 @@ from typing import Annotated
 
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from jwt.exceptions import InvalidTokenError
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..database import get_db
-from . import constants, schemas, service
+from ..database import get_async_db
+from ..user import schemas as user_schemas
+from . import constants, dependencies, exceptions, schemas, service
 
 router = APIRouter(
     prefix = "",
@@ -14,9 +17,9 @@ router = APIRouter(
 )
 
 @router.post("/token")
-async def login_for_access_and_refresh_token(form_data: Annotated[OAuth2PasswordRequestForm, Depends()], db: Session = Depends(get_db)):
+async def login_for_access_and_refresh_token(form_data: Annotated[OAuth2PasswordRequestForm, Depends()], db: AsyncSession = Depends(get_async_db)):
     #authenticate user
-    user = service.authenticate_user(entered_email=form_data.username, entered_password=form_data.password, db=db)
+    user = await service.authenticate_user(entered_email=form_data.username, entered_password=form_data.password, db=db)
     if not user:
         raise HTTPException(status_code=400, detail="Incorrect username or password")
     
@@ -39,3 +42,38 @@ async def login_for_access_and_refresh_token(form_data: Annotated[OAuth2Password
         "token_type" : "bearer"
     }
     return schemas.Token(**token)
+
+#no database access or password hashing: the refresh token's signature and the revocation set are all that is checked.
+#The scope is the one granted at login, revoke the refresh token to make a role change take effect
+@router.post("/token/refresh")
+async def refresh_access_token(request: schemas.RefreshRequest):
+    try:
+        refresh_token_data = dependencies.decode_token(request.refresh_token, token_type="refresh")
+    except (InvalidTokenError, ValidationError):
+        raise exceptions.credentials_exception("Could not validate refresh token", "Bearer")
+
+    access_token = service.create_access_token(
+        payload = {"email": refresh_token_data.email, "scope": refresh_token_data.scope},
+        expires_delta = timedelta(weeks=constants.ACCESS_TOKEN_EXPIRE_WEEKS)
+    )
+    return schemas.Token(access_token=access_token, refresh_token=request.refresh_token, token_type="bearer")
+
+@router.post("/logout")
+async def logout(
+    user_token_data: Annotated[user_schemas.JWTTokenData, Depends(dependencies.get_token_claims)],
+    request: schemas.LogoutRequest | None = None
+):
+    if request and request.refresh_token:
+        try:
+            refresh_token_data = dependencies.decode_token(request.refresh_token, token_type="refresh")
+        except (InvalidTokenError, ValidationError):
+            #expired, already revoked or forged, in any case it can't be used anymore
+            refresh_token_data = None
+        if refresh_token_data:
+            if refresh_token_data.email != user_token_data.email:
+                raise HTTPException(status_code=400, detail="Refresh token belongs to another user")
+            service.revoke_token(refresh_token_data)
+
+    service.revoke_token(user_token_data)
+    return {"message": "Logged out successfully"}
+
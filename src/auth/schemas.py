@@ -4,4 +4,10 @@ class Token(BaseModel):
     access_token: str
     refresh_token: str
     token_type: str
-    
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+class LogoutRequest(BaseModel):
+    #revoked along with the access token used to call /logout
+    refresh_token: str | None = None
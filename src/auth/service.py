@@ -1,14 +1,19 @@
+import asyncio
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timezone, timedelta
 
 import jwt
 from passlib.context import CryptContext
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..user import crud
-from . import config
+from ..user import crud, schemas as user_schemas
+from . import config, exceptions, revocation
 
 #initializes a CryptContext for hashing (passlib)
-hash_context = CryptContext(schemes=[config.HASH_ALGORITHM])
+#deprecated="auto" flags hashes made with a legacy algorithm or different rounds as needing an update
+hash_settings = {f"{config.HASH_ALGORITHM}__rounds": config.HASH_ROUNDS} if config.HASH_ROUNDS else {}
+hash_context = CryptContext(schemes=[config.HASH_ALGORITHM, *config.HASH_LEGACY_ALGORITHMS], deprecated="auto", **hash_settings)
 
 #hash password with passlib
 def hash_password(password: str):
@@ -17,26 +22,77 @@ def hash_password(password: str):
 def verify_hashed_password(password: str, hashed_password: str):
     return hash_context.verify(password, hashed_password)
 
-def authenticate_user(db: Session, entered_email: str, entered_password: str):
-    db_user = crud.get_user_by_email(db=db, email=entered_email)
+#returns (is_valid, new_hash), new_hash is None unless the stored hash uses outdated settings
+def verify_and_update_hashed_password(password: str, hashed_password: str):
+    return hash_context.verify_and_update(password, hashed_password)
+
+"""Hashing is CPU bound and takes tens to hundreds of milliseconds,
+the async wrappers below run it on a dedicated executor so the event loop keeps serving requests"""
+hash_executor = None
+hash_in_flight = 0
+
+def get_hash_executor():
+    global hash_executor
+    if hash_executor is None:
+        if config.HASH_EXECUTOR == "process":
+            hash_executor = ProcessPoolExecutor(max_workers=config.HASH_WORKERS)
+        else:
+            hash_executor = ThreadPoolExecutor(max_workers=config.HASH_WORKERS, thread_name_prefix="hashing")
+    return hash_executor
+
+def shutdown_hash_executor():
+    global hash_executor
+    if hash_executor is not None:
+        hash_executor.shutdown(wait=False, cancel_futures=True)
+        hash_executor = None
+
+async def run_hashing(function, *args):
+    global hash_in_flight
+    #shed load instead of queueing logins behind minutes of hashing work
+    if hash_in_flight >= config.HASH_WORKERS + config.HASH_MAX_PENDING:
+        raise exceptions.hashing_overloaded_exception()
+
+    hash_in_flight += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(get_hash_executor(), function, *args)
+    finally:
+        hash_in_flight -= 1
+
+async def hash_password_async(password: str):
+    return await run_hashing(hash_password, password)
+
+async def verify_and_update_password_async(password: str, hashed_password: str):
+    return await run_hashing(verify_and_update_hashed_password, password, hashed_password)
+
+async def authenticate_user(db: AsyncSession, entered_email: str, entered_password: str):
+    db_user = await crud.get_user_by_email(db=db, email=entered_email)
     if not db_user:
         return False
-    if not verify_hashed_password(entered_password, db_user.hashed_password):
+
+    is_valid, new_hashed_password = await verify_and_update_password_async(entered_password, db_user.hashed_password)
+    if not is_valid:
         return False
+
+    #the plaintext is only available at login, rehash now if HASH_ALGORITHM or HASH_ROUNDS changed
+    if new_hashed_password:
+        await crud.update_hashed_password(db=db, db_user=db_user, hashed_password=new_hashed_password)
     return db_user
     
-def create_access_token(payload: dict, expires_delta: timedelta = timedelta(days=1)):
+def _create_token(payload: dict, expires_delta: timedelta, token_type: str):
     expire_date = datetime.now(tz=timezone.utc) + expires_delta
-    payload.update({"exp": expire_date})
-    
+    #jti identifies the token for revocation, type keeps refresh tokens out of the Authorization header
+    payload.update({"exp": expire_date, "jti": uuid.uuid4().hex, "type": token_type})
+
     encoded_jwt = jwt.encode(payload, config.SECRET_KEY, config.JWT_ALGORITHM)
 
     return encoded_jwt
 
-def create_refresh_token(payload: dict, expires_delta: timedelta = timedelta(weeks=26)):
-    expire_date = datetime.now(tz=timezone.utc) + expires_delta
-    payload.update({"exp": expire_date})
+def create_access_token(payload: dict, expires_delta: timedelta = timedelta(days=1)):
+    return _create_token(payload, expires_delta, "access")
 
-    encoded_jwt = jwt.encode(payload, config.SECRET_KEY, config.JWT_ALGORITHM)
+def create_refresh_token(payload: dict, expires_delta: timedelta = timedelta(weeks=26)):
+    return _create_token(payload, expires_delta, "refresh")
 
-    return encoded_jwt
\ No newline at end of file
+def revoke_token(user_token_data: user_schemas.JWTTokenData):
+    #kept until the token would have expired anyway
+    revocation.revoked_tokens.add(user_token_data.jti, user_token_data.expire_date.timestamp())
@@ -0,0 +1,107 @@
+from .. import cache
+from . import config, isbn as isbn_format, schemas
+
+"""Cache for single book lookups, read through by crud.get_cached_book_by_isbn_or_id.
+
+Entries are schemas.Book json stored under both "book:id:<id>" and "book:isbn:<isbn13>".
+Every write path (create, update, delete, borrow/return) calls invalidate() after commit.
+Only found books are cached, so a newly created book never hides behind a cached miss."""
+
+class MemoryBackend:
+    def __init__(self, maxsize: int, ttl: int):
+        self._entries = cache.TTLCache(maxsize=maxsize, ttl=ttl)
+
+    async def get(self, key: str) -> str | None:
+        value = self._entries.get(key)
+        return None if value is cache.MISSING else value
+
+    async def set(self, key: str, value: str):
+        self._entries.set(key, value)
+
+    async def delete(self, *keys: str):
+        for key in keys:
+            self._entries.delete(key)
+
+    async def close(self):
+        self._entries.clear()
+
+    def stats(self):
+        return {"backend": "memory", **self._entries.stats()}
+
+class RedisBackend:
+    """Any server speaking the Redis protocol works, e.g. a local redis-server or a stand-in in tests"""
+
+    def __init__(self, url: str, ttl: int):
+        #optional dependency, only needed when BOOK_CACHE_BACKEND=redis
+        import redis.asyncio
+
+        self._client = redis.asyncio.from_url(url, decode_responses=True)
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, key: str) -> str | None:
+        value = await self._client.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: str):
+        await self._client.set(key, value, ex=self.ttl)
+
+    async def delete(self, *keys: str):
+        if keys:
+            await self._client.delete(*keys)
+
+    async def close(self):
+        await self._client.aclose()
+
+    def stats(self):
+        #evictions happen server side, see INFO stats evicted_keys
+        return {"backend": "redis", "hits": self.hits, "misses": self.misses}
+
+def create_backend():
+    if config.BOOK_CACHE_BACKEND == "redis":
+        return RedisBackend(config.BOOK_CACHE_REDIS_URL, ttl=config.BOOK_CACHE_TTL)
+    return MemoryBackend(maxsize=config.BOOK_CACHE_SIZE, ttl=config.BOOK_CACHE_TTL)
+
+backend = create_backend()
+
+def set_backend(new_backend):
+    global backend
+    backend = new_backend
+
+def id_key(book_id: int):
+    return f"book:id:{book_id}"
+
+def isbn_key(isbn: str):
+    #keyed by the ISBN-13 form so both spellings share one entry
+    return f"book:isbn:{isbn_format.normalize_or_none(isbn) or isbn}"
+
+async def store(book: schemas.Book):
+    payload = book.model_dump_json()
+    await backend.set(id_key(book.id), payload)
+    await backend.set(isbn_key(book.isbn), payload)
+
+async def lookup(isbn_or_id: str) -> schemas.Book | None:
+    #the same shape rules as crud.get_book_by_isbn_or_id decide between the id and the isbn key
+    kind, value = isbn_format.parse_isbn_or_id(isbn_or_id)
+    key = id_key(value) if kind == "id" else isbn_key(value)
+
+    payload = await backend.get(key)
+    if payload is None:
+        return None
+    try:
+        return schemas.Book.model_validate_json(payload)
+    except ValueError:
+        #written by an older schema, e.g. in a shared redis during a deploy
+        await backend.delete(key)
+        return None
+
+async def invalidate(book_id: int, *isbns: str):
+    await backend.delete(id_key(book_id), *(isbn_key(isbn) for isbn in isbns if isbn))
+
+def stats():
+    return backend.stats()
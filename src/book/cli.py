@@ -0,0 +1,91 @@
+import argparse
+import asyncio
+import sys
+
+from ..database import AsyncSessionLocal, dispose_engines, get_async_engine
+from . import export, ingest, openlibrary, service
+
+"""Catalog maintenance commands, run from the project root:
+
+    python -m src.book.cli import-isbns isbns.txt
+    python -m src.book.cli ingest catalog.csv
+    python -m src.book.cli export --format csv --fields id,title,isbn --gzip -o books.csv.gz
+"""
+
+async def with_database(command):
+    #engines are created lazily, the command owns them for its whole run
+    get_async_engine()
+    try:
+        return await command
+    finally:
+        await dispose_engines()
+
+def read_isbns(path: str) -> list[str]:
+    #one isbn per line, blank lines and #comments are ignored, "-" reads stdin
+    stream = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    with stream:
+        return [line.split("#", 1)[0].strip() for line in stream if line.split("#", 1)[0].strip()]
+
+async def import_isbns(path: str):
+    try:
+        async with AsyncSessionLocal() as db:
+            report = await service.import_isbns(db=db, isbns=read_isbns(path))
+    finally:
+        await openlibrary.close_client()
+
+    #one json report per line so the output can be filtered with jq/grep
+    for result in report.results:
+        print(result.model_dump_json())
+    print(f"created={report.created} skipped={report.skipped} failed={report.failed}", file=sys.stderr)
+    return 1 if report.failed else 0
+
+async def ingest_file(path: str, format: str | None):
+    format = format or ("csv" if path.lower().endswith(".csv") else "ndjson")
+    stream = sys.stdin.buffer if path == "-" else open(path, "rb")
+    with stream:
+        async with AsyncSessionLocal() as db:
+            report = await ingest.ingest(db=db, stream=stream, format=format)
+
+    for error in report.errors:
+        print(error.model_dump_json())
+    print(f"processed={report.processed} upserted={report.upserted} rejected={report.rejected}", file=sys.stderr)
+    return 1 if report.rejected else 0
+
+async def export_books(output: str, format: str, fields: list[str], compress: bool):
+    stream = sys.stdout.buffer if output == "-" else open(output, "wb")
+    with stream:
+        async for chunk in export.export_stream(fields, format=format, compress=compress):
+            stream.write(chunk)
+    return 0
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(prog="python -m src.book.cli")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = commands.add_parser("import-isbns", help="create books for a file of ISBNs using Open Library")
+    import_parser.add_argument("path", help="file with one ISBN per line, - for stdin")
+
+    ingest_parser = commands.add_parser("ingest", help="upsert books from a CSV or NDJSON file")
+    ingest_parser.add_argument("path", help="input file, - for stdin")
+    ingest_parser.add_argument("--format", choices=["csv", "ndjson"], help="defaults to csv for .csv files, ndjson otherwise")
+
+    export_parser = commands.add_parser("export", help="write the catalog as NDJSON or CSV")
+    export_parser.add_argument("-o", "--output", default="-", help="output file, - for stdout")
+    export_parser.add_argument("--format", choices=["ndjson", "csv"], default="ndjson")
+    export_parser.add_argument("--fields", help="comma separated columns, all by default")
+    export_parser.add_argument("--gzip", action="store_true", help="gzip the output")
+
+    args = parser.parse_args(argv)
+    if args.command == "import-isbns":
+        return asyncio.run(with_database(import_isbns(args.path)))
+    if args.command == "ingest":
+        return asyncio.run(with_database(ingest_file(args.path, args.format)))
+    if args.command == "export":
+        try:
+            fields = export.parse_fields(args.fields)
+        except ValueError as error:
+            parser.error(str(error))
+        return asyncio.run(with_database(export_books(args.output, args.format, fields, args.gzip)))
+
+if __name__ == "__main__":
+    sys.exit(main())
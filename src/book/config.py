@@ -0,0 +1,20 @@
+import os
+
+#base url of the Open Library API, point it at a local stand-in for tests
+OPENLIBRARY_URL = os.environ.get("OPENLIBRARY_URL", "http://openlibrary.org")
+#maximum number of Open Library requests in flight at once
+OPENLIBRARY_CONCURRENCY = int(os.environ.get("OPENLIBRARY_CONCURRENCY", 8))
+
+#Open Library metadata cache, an empty OPENLIBRARY_CACHE_PATH keeps it in memory only
+OPENLIBRARY_CACHE_PATH = os.environ.get("OPENLIBRARY_CACHE_PATH", ".cache/openlibrary.sqlite3")
+OPENLIBRARY_CACHE_SIZE = int(os.environ.get("OPENLIBRARY_CACHE_SIZE", 10000))
+#seconds to keep found records and "unknown isbn" answers
+OPENLIBRARY_CACHE_TTL = int(os.environ.get("OPENLIBRARY_CACHE_TTL", 7 * 24 * 3600))
+OPENLIBRARY_CACHE_NEGATIVE_TTL = int(os.environ.get("OPENLIBRARY_CACHE_NEGATIVE_TTL", 3600))
+
+#read-through cache for book lookups: "memory" (per process LRU) or "redis" (shared between workers)
+BOOK_CACHE_BACKEND = os.environ.get("BOOK_CACHE_BACKEND", "memory")
+BOOK_CACHE_REDIS_URL = os.environ.get("BOOK_CACHE_REDIS_URL", "redis://localhost:6379/0")
+BOOK_CACHE_SIZE = int(os.environ.get("BOOK_CACHE_SIZE", 10000))
+#per process entries may be stale for this long after a write on another worker
+BOOK_CACHE_TTL = int(os.environ.get("BOOK_CACHE_TTL", 300))
@@ -0,0 +1,16 @@
+#seconds before an Open Library request is abandoned
+TIMEOUT = 15.0
+#ISBNs per Open Library multi-record request, keeps the url well under common length limits
+OPENLIBRARY_BATCH_SIZE = 50
+#rows per multi-row INSERT during imports
+INSERT_BATCH_SIZE = 500
+#largest ISBN list accepted by the bulk import endpoint, use the CLI for bigger collections
+BULK_IMPORT_MAX_ISBNS = 5000
+#rows fetched per round trip from the server-side cursor during exports
+EXPORT_BATCH_SIZE = 1000
+#rows validated and upserted per transaction during file ingestion
+INGEST_BATCH_SIZE = 1000
+#rejected rows listed in an ingest report, the rest are only counted
+INGEST_MAX_REPORTED_ERRORS = 1000
+#keys accepted per batch lookup, each kind of key is resolved with one IN (...) query
+BATCH_LOOKUP_MAX_KEYS = 200
@@ -1,33 +1,232 @@
-from sqlalchemy import select, or_
-from sqlalchemy.orm import Session
-from . import schemas, models
+from sqlalchemy import and_, column, insert, select, or_, table, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from .. import pagination
+from . import cache as book_cache, constants, isbn as isbn_format, schemas, models, search
 
-def get_book_by_id(db: Session, book_id: int):
-    return db.execute(select(models.Book).where(models.Book.id == book_id)).scalars().first()
+#sort keys for keyset pagination, each one ends in the primary key so ties are broken deterministically
+#and each one is covered by an index (primary key, ix_book_title_id)
+BOOK_ORDERINGS = {
+    "id": (models.Book.id,),
+    "title": (models.Book.title, models.Book.id),
+}
 
-def get_book_by_isbn(db: Session, isbn: int):   
-    return db.execute(select(models.Book).where(models.Book.isbn == isbn)).scalars().first()
+async def get_book_by_id(db: AsyncSession, book_id: int):
+    return (await db.execute(select(models.Book).where(models.Book.id == book_id))).scalars().first()
 
-def get_book_by_isbn_or_id(db: Session, isbn_or_id: str):
-    return db.execute(select(models.Book).where(or_(models.Book.isbn == isbn_or_id, models.Book.id == isbn_or_id))).scalars().first()
+def _isbn_condition(isbn: str):
+    #valid isbns are matched in either spelling through isbn13, anything else as stored
+    isbn13 = isbn_format.normalize_or_none(isbn)
+    return models.Book.isbn13 == isbn13 if isbn13 else models.Book.isbn == isbn
 
-def get_books(db: Session, skip: int = 0, limit: int = 20):
-    return db.execute(select(models.Book).offset(skip).limit(limit).all())
+def _isbn_or_id_condition(isbn_or_id: str):
+    """A single equality on one unique index (id, isbn13 or isbn), chosen from the input's shape"""
+    kind, value = isbn_format.parse_isbn_or_id(isbn_or_id)
+    if kind == "id":
+        return models.Book.id == value
+    if kind == "isbn13":
+        return models.Book.isbn13 == value
+    return models.Book.isbn == value
 
-def create_book(db: Session, book: schemas.BookCreate):
+async def get_book_by_isbn(db: AsyncSession, isbn: str):
+    return (await db.execute(select(models.Book).where(_isbn_condition(isbn)))).scalars().first()
+
+async def get_book_by_isbn_or_id(db: AsyncSession, isbn_or_id: str):
+    return (await db.execute(select(models.Book).where(_isbn_or_id_condition(isbn_or_id)))).scalars().first()
+
+async def get_books_by_isbns_or_ids(db: AsyncSession, keys: list[str]) -> dict[str, models.Book]:
+    """Resolve many keys of get_book_by_isbn_or_id at once, with one IN query per kind of key
+    (id, isbn13, isbn as stored). Returns key -> book for the keys that matched"""
+    parsed = {key: isbn_format.parse_isbn_or_id(key) for key in keys}
+    lookup_columns = {"id": models.Book.id, "isbn13": models.Book.isbn13, "isbn": models.Book.isbn}
+
+    found = {}
+    for kind, lookup_column in lookup_columns.items():
+        values = {value for key_kind, value in parsed.values() if key_kind == kind}
+        if values:
+            db_books = (await db.execute(select(models.Book).where(lookup_column.in_(values)))).scalars().all()
+            found.update({(kind, getattr(db_book, lookup_column.key)): db_book for db_book in db_books})
+
+    return {key: found[parsed_key] for key, parsed_key in parsed.items() if parsed_key in found}
+
+async def get_cached_book_by_isbn_or_id(db: AsyncSession, isbn_or_id: str) -> schemas.Book | None:
+    """Read-through variant of get_book_by_isbn_or_id returning the response schema"""
+    book = await book_cache.lookup(isbn_or_id)
+    if book is not None:
+        return book
+
+    db_book = await get_book_by_isbn_or_id(db=db, isbn_or_id=isbn_or_id)
+    if db_book is None:
+        return None
+
+    book = schemas.Book.model_validate(db_book)
+    #a lagging replica could put back a row that was just invalidated
+    if not db.info.get("replica", False):
+        await book_cache.store(book)
+    return book
+
+#columns a listing can be restricted to with fields=
+BOOK_FIELDS = list(schemas.Book.model_fields)
+
+def _sparse_columns(fields: list[str], *required):
+    """Columns selected for a sparse listing: the requested ones plus those ordering and cursors need"""
+    names = dict.fromkeys([*fields, *(column.key for column in required)])
+    return [getattr(models.Book, name) for name in names]
+
+def _is_type(value, python_type) -> bool:
+    #json true/false would pass as integers
+    return isinstance(value, python_type) and not isinstance(value, bool)
+
+def _cursor_key(last_key: list, columns) -> list:
+    """Check a decoded cursor key against the types of its columns, so a forged cursor is a ValueError, not a database error"""
+    if len(last_key) != len(columns) or not all(_is_type(value, column.type.python_type) for value, column in zip(last_key, columns)):
+        raise ValueError("Malformed cursor")
+    return last_key
+
+def _book_page_statement(entities, limit: int, cursor: str | None, order_by: str):
+    columns = BOOK_ORDERINGS[order_by]
+    statement = select(*entities).order_by(*columns)
+
+    if cursor:
+        #seek past the last row of the previous page instead of counting rows with OFFSET
+        last_key = _cursor_key(pagination.decode_cursor(order_by, cursor), columns)
+        statement = statement.where(tuple_(*columns) > tuple_(*last_key))
+
+    #fetch one extra row to know whether another page exists
+    return statement.limit(limit + 1)
+
+async def get_books(
+    db: AsyncSession, limit: int = 20, cursor: str | None = None, order_by: str = "id", fields: list[str] | None = None
+):
+    """Return a page of books and the cursor for the next page (None on the last page).
+    With fields only those columns are loaded and the books are dicts instead of models.
+    Raises ValueError if the cursor is malformed or was issued for another ordering"""
+    columns = BOOK_ORDERINGS[order_by]
+    if fields is None:
+        rows = (await db.execute(_book_page_statement([models.Book], limit, cursor, order_by))).scalars().all()
+        sort_key = lambda db_book: [getattr(db_book, column.key) for column in columns]
+    else:
+        statement = _book_page_statement(_sparse_columns(fields, *columns), limit, cursor, order_by)
+        rows = (await db.execute(statement)).mappings().all()
+        sort_key = lambda row: [row[column.key] for column in columns]
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = pagination.encode_cursor(order_by, sort_key(rows[-1]))
+
+    if fields is not None:
+        #ordering columns that weren't asked for are dropped again
+        rows = [{name: row[name] for name in fields} for row in rows]
+    return rows, next_cursor
+
+async def get_book_page_versions(db: AsyncSession, limit: int = 20, cursor: str | None = None, order_by: str = "id"):
+    """(id, version) of the rows get_books would return, including the look-ahead row, without loading them"""
+    statement = _book_page_statement([models.Book.id, models.Book.version], limit, cursor, order_by)
+    return (await db.execute(statement)).all()
+
+async def get_book_version_by_isbn_or_id(db: AsyncSession, isbn_or_id: str):
+    """(id, version) of the book get_book_by_isbn_or_id would return, or None"""
+    statement = select(models.Book.id, models.Book.version).where(_isbn_or_id_condition(isbn_or_id))
+    return (await db.execute(statement)).first()
+
+async def search_books(
+    db: AsyncSession,
+    query: str,
+    limit: int = 20,
+    cursor: str | None = None,
+    language: str | None = None,
+    is_borrowed: bool | None = None,
+    fields: list[str] | None = None
+):
+    """Return a page of books matching query, best match first, and the cursor for the next page.
+    With fields only those columns are loaded and the books are dicts instead of models.
+    Raises ValueError if the cursor is malformed"""
+    if not query.strip():
+        return [], None
+
+    entities = [models.Book] if fields is None else _sparse_columns(fields, models.Book.id)
+    if db.bind.dialect.name == "sqlite":
+        match, rank = search.sqlite_match(query)
+        book_fts = table("book_fts", column("rowid"))
+        statement = select(*entities, rank).join(book_fts, book_fts.c.rowid == models.Book.id)
+    else:
+        match, rank = search.postgres_match(query)
+        statement = select(*entities, rank)
+
+    statement = statement.where(match)
+    if language is not None:
+        statement = statement.where(models.Book.language == language)
+    if is_borrowed is not None:
+        statement = statement.where(models.Book.is_borrowed == is_borrowed)
+
+    if cursor:
+        last_key = pagination.decode_cursor("rank", cursor)
+        if len(last_key) != 2 or not _is_type(last_key[0], (int, float)) or not _is_type(last_key[1], int):
+            raise ValueError("Malformed cursor")
+        last_rank, last_id = last_key
+        statement = statement.where(or_(rank < last_rank, and_(rank == last_rank, models.Book.id > last_id)))
+
+    rows = (await db.execute(statement.order_by(rank.desc(), models.Book.id).limit(limit + 1))).all()
+
+    if fields is None:
+        books = [db_book for db_book, _ in rows]
+        book_ids = [db_book.id for db_book in books]
+    else:
+        books = [{name: row._mapping[name] for name in fields} for row in rows]
+        book_ids = [row._mapping["id"] for row in rows]
+
+    next_cursor = None
+    if len(rows) > limit:
+        books = books[:limit]
+        #rank is the last selected column
+        next_cursor = pagination.encode_cursor("rank", [rows[limit - 1][-1], book_ids[limit - 1]])
+
+    return books, next_cursor
+
+async def create_book(db: AsyncSession, book: schemas.BookCreate):
     #convert pydantic model to python dict
     book_dict = book.model_dump(exclude_unset=True)
     #unpack book_dict into model
     db_book = models.Book(**book_dict)
 
     db.add(db_book)
-    db.commit()
-    db.refresh(db_book)
+    await db.commit()
+    await db.refresh(db_book)
+    #nothing is cached for a new book, but a stale entry may remain for a reused isbn
+    await book_cache.invalidate(db_book.id, db_book.isbn)
 
     return db_book
 
-def update_book(db: Session, book_id: int, book: schemas.BookUpdate):
-    db_book = get_book_by_id(db=db, book_id=book_id)
+async def get_existing_isbns(db: AsyncSession, isbns: list[str]) -> set[str]:
+    """The given isbns already in the catalog in either spelling, invalid isbns are never reported"""
+    normalized = {isbn: isbn_format.normalize_or_none(isbn) for isbn in isbns}
+    isbn13s = list({isbn13 for isbn13 in normalized.values() if isbn13})
+    stored = set()
+    #chunk the IN list so large imports don't hit bind parameter limits
+    for start in range(0, len(isbn13s), constants.INSERT_BATCH_SIZE):
+        chunk = isbn13s[start:start + constants.INSERT_BATCH_SIZE]
+        stored.update((await db.execute(select(models.Book.isbn13).where(models.Book.isbn13.in_(chunk)))).scalars())
+    return {isbn for isbn, isbn13 in normalized.items() if isbn13 in stored}
+
+async def create_books(db: AsyncSession, books: list[schemas.BookCreate]) -> dict[str, int]:
+    """Insert books with multi-row INSERT ... RETURNING statements in a single transaction.
+    Returns a mapping of isbn to the new book id"""
+    #dump every field, not only the set ones, so all rows share a shape and batch into one statement
+    rows = [book.model_dump() for book in books]
+    created = {}
+
+    for start in range(0, len(rows), constants.INSERT_BATCH_SIZE):
+        statement = insert(models.Book).returning(models.Book.id, models.Book.isbn)
+        result = await db.execute(statement, rows[start:start + constants.INSERT_BATCH_SIZE])
+        created.update({isbn: book_id for book_id, isbn in result.all()})
+
+    #new rows only, nothing cached can refer to them
+    await db.commit()
+    return created
+
+async def update_book(db: AsyncSession, book_id: int, book: schemas.BookUpdate):
+    db_book = await get_book_by_id(db=db, book_id=book_id)
+    previous_isbn = db_book.isbn
     update_data = book.model_dump(exclude_unset=True)
 
     """If fields have been modified, setattr, if not then skip setattr"""
@@ -36,15 +235,27 @@ def update_book(db: Session, book_id: int, book: schemas.BookUpdate):
             setattr(db_book, key, value)
 
     db.add(db_book)
-    db.commit()
-    db.refresh(db_book)
+    await db.commit()
+    await db.refresh(db_book)
+    await book_cache.invalidate(book_id, previous_isbn, db_book.isbn)
+
+    return db_book
+
+async def set_book_cover(db: AsyncSession, book_id: int, cover_hash: str | None):
+    db_book = await get_book_by_id(db=db, book_id=book_id)
+    db_book.cover_hash = cover_hash
+
+    await db.commit()
+    await db.refresh(db_book)
+    await book_cache.invalidate(book_id, db_book.isbn)
 
     return db_book
 
-def delete_book(db: Session, book_id: int):
-    db_book = get_book_by_id(db=db, book_id=book_id)
+async def delete_book(db: AsyncSession, book_id: int):
+    db_book = await get_book_by_id(db=db, book_id=book_id)
 
-    db.delete(db_book)
-    db.commit()
+    await db.delete(db_book)
+    await db.commit()
+    await book_cache.invalidate(book_id, db_book.isbn)
 
-    return {"message": "Book deleted successfully"}
\ No newline at end of file
+    return {"message": "Book deleted successfully"}
@@ -0,0 +1,73 @@
+import csv
+import io
+import json
+import zlib
+
+from sqlalchemy import select
+
+from .. import fields as sparse_fields
+from ..database import AsyncSessionLocal
+from . import constants, models
+
+"""Catalog export streamed from a server-side cursor.
+
+Rows are fetched EXPORT_BATCH_SIZE at a time and encoded chunk by chunk, so memory use
+stays constant whatever the catalog size. Only the requested columns are selected."""
+
+EXPORT_FIELDS = [
+    "id", "title", "author", "isbn", "isbn13", "edition", "publisher", "publish_date", "publish_place",
+    "number_of_pages", "description", "language", "lccn", "subtitle", "subjects",
+    "added_date", "borrowed_date", "returned_date", "is_borrowed", "version", "cover_hash",
+]
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+def parse_fields(fields: str | None) -> list[str]:
+    """Validate a comma separated column selection, raises ValueError on unknown names"""
+    if not fields:
+        return list(EXPORT_FIELDS)
+    return sparse_fields.parse_fields(fields, EXPORT_FIELDS)
+
+def _encode_ndjson(fields: list[str], rows) -> str:
+    #dates are written as ISO strings
+    return "".join(json.dumps(dict(zip(fields, row)), default=str) + "\n" for row in rows)
+
+def _encode_csv(fields: list[str], rows) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
+
+async def _stream_rows(fields: list[str]):
+    columns = [getattr(models.Book, name) for name in fields]
+    statement = select(*columns).order_by(models.Book.id).execution_options(yield_per=constants.EXPORT_BATCH_SIZE)
+
+    #the session lives as long as the stream, not the request dependency, which closes before the body is sent
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(statement)
+        async for partition in result.partitions():
+            yield partition
+
+async def export_stream(fields: list[str], format: str = "ndjson", compress: bool = False):
+    """Yield the encoded export as bytes chunks, gzip compressed when compress is set"""
+    encode = _encode_csv if format == "csv" else _encode_ndjson
+    #wbits=31 writes a gzip container instead of a bare zlib stream
+    compressor = zlib.compressobj(wbits=31) if compress else None
+
+    chunks = []
+    if format == "csv":
+        chunks.append(_encode_csv(fields, [fields]))
+
+    async for rows in _stream_rows(fields):
+        chunks.append(encode(fields, rows))
+        data = "".join(chunks).encode()
+        chunks = []
+        if compressor:
+            data = compressor.compress(data)
+        if data:
+            yield data
+
+    data = "".join(chunks).encode()
+    if compressor:
+        data = compressor.compress(data) + compressor.flush()
+    if data:
+        yield data
@@ -0,0 +1,125 @@
+import asyncio
+import csv
+import io
+import itertools
+import json
+from typing import BinaryIO
+
+from pydantic import ValidationError
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import cache as book_cache, constants, isbn as isbn_format, models, schemas
+
+"""Bulk catalog ingestion from CSV or NDJSON files.
+
+The input is read lazily, INGEST_BATCH_SIZE rows at a time in a worker thread, validated with BookCreate
+and upserted on the normalized isbn in batches using multi-row INSERT ... ON CONFLICT (isbn13) DO UPDATE
+statements (insertmanyvalues), one transaction per batch. A batch the database refuses is retried row
+by row, so rows failing validation or a database constraint are both reported with their line number."""
+
+#loans are never taken from catalog files
+EXCLUDED_FIELDS = {"user_id"}
+
+def _csv_records(stream: BinaryIO):
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding="utf-8-sig", newline=""))
+    line_number = reader.line_num + 1
+    for row in reader:
+        #empty cells mean "no value", not an empty string
+        yield line_number, {key: value for key, value in row.items() if key and value not in ("", None)}
+        line_number = reader.line_num + 1
+
+def _ndjson_records(stream: BinaryIO):
+    for line_number, line in enumerate(io.TextIOWrapper(stream, encoding="utf-8-sig"), start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield line_number, None
+            continue
+        yield line_number, record if isinstance(record, dict) else None
+
+def _upsert_statement(dialect_name: str):
+    insert = postgresql.insert if dialect_name == "postgresql" else sqlite.insert
+    statement = insert(models.Book)
+    updatable = set(schemas.BookCreate.model_fields) - EXCLUDED_FIELDS - {"isbn"}
+    return (
+        statement.on_conflict_do_update(
+            #an ISBN-10 row updates the book stored under its ISBN-13 and the reverse, the stored isbn is kept
+            index_elements=[models.Book.isbn13],
+            set_={**{name: statement.excluded[name] for name in updatable}, "version": models.Book.version + 1},
+        )
+        .returning(models.Book.id, models.Book.isbn)
+    )
+
+def _truncate_errors(report: schemas.BookIngestReport):
+    #keep the lowest line numbers, database rejections arrive after later lines were validated
+    report.errors.sort(key=lambda error: error.line)
+    del report.errors[constants.INGEST_MAX_REPORTED_ERRORS:]
+
+def _reject(report: schemas.BookIngestReport, line_number: int, detail: str):
+    report.rejected += 1
+    report.errors.append(schemas.BookIngestError(line=line_number, detail=detail))
+    #bounded, but sorted and cut only once in a while
+    if len(report.errors) >= 2 * constants.INGEST_MAX_REPORTED_ERRORS:
+        _truncate_errors(report)
+
+async def _upsert(db: AsyncSession, rows: list[dict]) -> int:
+    result = await db.execute(_upsert_statement(db.bind.dialect.name), rows)
+    upserted = result.all()
+    await db.commit()
+
+    #updated rows may be cached under their id and isbn
+    for book_id, isbn in upserted:
+        await book_cache.invalidate(book_id, isbn)
+    return len(upserted)
+
+async def _write_batch(db: AsyncSession, batch: dict[str, tuple[int, dict]], report: schemas.BookIngestReport):
+    try:
+        report.upserted += await _upsert(db, [row for _, row in batch.values()])
+        return
+    except DBAPIError:
+        await db.rollback()
+
+    #the database refused the batch (a value too long for its column...), find the offending rows
+    for line_number, row in batch.values():
+        try:
+            report.upserted += await _upsert(db, [row])
+        except DBAPIError as error:
+            await db.rollback()
+            _reject(report, line_number, str(error.orig))
+
+async def ingest(db: AsyncSession, stream: BinaryIO, format: str) -> schemas.BookIngestReport:
+    records = _csv_records(stream) if format == "csv" else _ndjson_records(stream)
+    report = schemas.BookIngestReport()
+    #isbn13 -> (line number, row): a statement can't upsert the same row twice, the last occurrence in a batch wins
+    batch: dict[str, tuple[int, dict]] = {}
+
+    #the upload may be spooled to disk, reading and parsing it stays off the event loop
+    while chunk := await asyncio.to_thread(list, itertools.islice(records, constants.INGEST_BATCH_SIZE)):
+        for line_number, record in chunk:
+            report.processed += 1
+            try:
+                if record is None:
+                    raise ValueError("Not a JSON object")
+                book = schemas.BookCreate.model_validate(record)
+            except (ValidationError, ValueError) as error:
+                detail = "; ".join(f"{'.'.join(map(str, item['loc']))}: {item['msg']}" for item in error.errors()) if isinstance(error, ValidationError) else str(error)
+                _reject(report, line_number, detail)
+                continue
+
+            #BookCreate only accepts valid isbns, so normalize can't fail here
+            isbn13 = isbn_format.normalize(book.isbn)
+            if isbn13 in batch:
+                report.superseded += 1
+            batch[isbn13] = (line_number, book.model_dump(exclude=EXCLUDED_FIELDS))
+            if len(batch) >= constants.INGEST_BATCH_SIZE:
+                await _write_batch(db, batch, report)
+                batch = {}
+
+    if batch:
+        await _write_batch(db, batch, report)
+    _truncate_errors(report)
+    return report
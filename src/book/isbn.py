@@ -0,0 +1,61 @@
+"""ISBN validation and normalization.
+
+Every valid ISBN-10 has an ISBN-13 form (978 prefix, recomputed check digit), Book.isbn13
+stores that form so both spellings of the same book resolve to one row."""
+
+#hyphens and spaces are only presentation
+SEPARATORS = str.maketrans("", "", "- ")
+
+def clean(value: str) -> str:
+    return value.translate(SEPARATORS).upper()
+
+def is_valid_isbn10(value: str) -> bool:
+    if len(value) != 10 or not value[:9].isdigit() or not (value[9].isdigit() or value[9] == "X"):
+        return False
+    digits = [int(character) for character in value[:9]] + [10 if value[9] == "X" else int(value[9])]
+    return sum(weight * digit for weight, digit in zip(range(10, 0, -1), digits)) % 11 == 0
+
+def _isbn13_check_digit(first_twelve: str) -> str:
+    total = sum(int(digit) * (3 if index % 2 else 1) for index, digit in enumerate(first_twelve))
+    return str((10 - total % 10) % 10)
+
+def is_valid_isbn13(value: str) -> bool:
+    return len(value) == 13 and value.isdigit() and _isbn13_check_digit(value[:12]) == value[12]
+
+def is_valid(value: str) -> bool:
+    value = clean(value)
+    return is_valid_isbn10(value) or is_valid_isbn13(value)
+
+def to_isbn13(isbn10: str) -> str:
+    first_twelve = "978" + isbn10[:9]
+    return first_twelve + _isbn13_check_digit(first_twelve)
+
+def normalize(value: str) -> str:
+    """ISBN-13 form of an ISBN-10 or ISBN-13, raises ValueError if value is neither"""
+    value = clean(value)
+    if is_valid_isbn13(value):
+        return value
+    if is_valid_isbn10(value):
+        return to_isbn13(value)
+    raise ValueError(f"Invalid ISBN: {value}")
+
+def normalize_or_none(value: str | None) -> str | None:
+    try:
+        return normalize(value) if value else None
+    except ValueError:
+        return None
+
+#largest value of the integer primary key
+MAX_BOOK_ID = 2**31 - 1
+
+def parse_isbn_or_id(value: str) -> tuple[str, str | int]:
+    """Decide from its shape what a path parameter refers to:
+    ("isbn13", normalized isbn) for a valid ISBN-10/13, ("id", book id) for other integers in the
+    primary key range, ("isbn", value) for anything else, matched as stored (legacy invalid isbns).
+    A valid ISBN always wins: a ten digit id that is also a valid ISBN-10 is read as that ISBN."""
+    isbn13 = normalize_or_none(value)
+    if isbn13:
+        return "isbn13", isbn13
+    if value.isdigit() and int(value) <= MAX_BOOK_ID:
+        return "id", int(value)
+    return "isbn", value
@@ -0,0 +1,153 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+
+from .. import cache
+from . import config, openlibrary, schemas
+
+"""Two-tier cache in front of Open Library lookups.
+
+An in-process LRU answers repeat lookups without IO, a SQLite file keeps answers across restarts
+and workers. Both found records and "unknown isbn" answers are cached, with separate TTLs;
+timeouts and request errors are not. Concurrent lookups of the same ISBN share one upstream request."""
+
+#how long a lookup waits for another request already fetching the same isbn
+LOOKUP_TIMEOUT = 60.0
+#SQLite's default limit on bind parameters per statement is 999
+STORE_CHUNK_SIZE = 500
+
+class PersistentStore:
+    def __init__(self, path: str):
+        self.path = path
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS isbn_metadata (isbn TEXT PRIMARY KEY, payload TEXT, expires_at REAL NOT NULL)"
+            )
+            #expired entries are never read again, drop them once per process when the file is opened
+            self._purge_expired(self._connection)
+        return self._connection
+
+    @staticmethod
+    def _purge_expired(connection):
+        connection.execute("DELETE FROM isbn_metadata WHERE expires_at <= ?", [time.time()])
+        connection.commit()
+
+    def get_many(self, isbns: list[str]) -> dict[str, tuple[str | None, float]]:
+        """Return isbn -> (json payload or None for unknown isbns, expiry timestamp) for unexpired entries"""
+        found = {}
+        with self._lock:
+            connection = self._connect()
+            for start in range(0, len(isbns), STORE_CHUNK_SIZE):
+                chunk = isbns[start:start + STORE_CHUNK_SIZE]
+                rows = connection.execute(
+                    f"SELECT isbn, payload, expires_at FROM isbn_metadata WHERE isbn IN ({','.join('?' * len(chunk))}) AND expires_at > ?",
+                    [*chunk, time.time()],
+                ).fetchall()
+                found.update({isbn: (payload, expires_at) for isbn, payload, expires_at in rows})
+        return found
+
+    def set_many(self, entries: list[tuple[str, str | None, float]]):
+        with self._lock:
+            connection = self._connect()
+            connection.executemany("INSERT OR REPLACE INTO isbn_metadata (isbn, payload, expires_at) VALUES (?, ?, ?)", entries)
+            connection.commit()
+
+    def purge_expired(self):
+        with self._lock:
+            self._purge_expired(self._connect())
+
+_memory = cache.TTLCache(maxsize=config.OPENLIBRARY_CACHE_SIZE, ttl=config.OPENLIBRARY_CACHE_TTL)
+_store = PersistentStore(config.OPENLIBRARY_CACHE_PATH) if config.OPENLIBRARY_CACHE_PATH else None
+#isbn -> future resolving to (book or None, error message or None) while a lookup is in progress
+_in_flight: dict[str, asyncio.Future] = {}
+
+def stats():
+    return _memory.stats()
+
+def clear():
+    _memory.clear()
+
+def _copy(book: schemas.BookCreate | None):
+    #callers get their own model, cached instances are shared between requests
+    return book.model_copy() if book is not None else None
+
+def _remember(isbn: str, book: schemas.BookCreate | None):
+    ttl = config.OPENLIBRARY_CACHE_TTL if book is not None else config.OPENLIBRARY_CACHE_NEGATIVE_TTL
+    _memory.set(isbn, book, ttl=ttl)
+    return (isbn, book.model_dump_json() if book is not None else None, time.time() + ttl)
+
+async def _load(isbns: list[str]) -> tuple[dict, dict]:
+    """Resolve isbns this call has claimed: persistent tier first, then Open Library"""
+    books, errors = {}, {}
+
+    stored = await asyncio.to_thread(_store.get_many, isbns) if _store else {}
+    for isbn, (payload, expires_at) in stored.items():
+        books[isbn] = schemas.BookCreate.model_validate_json(payload) if payload is not None else None
+        _memory.set(isbn, books[isbn], ttl=max(expires_at - time.time(), 0))
+
+    fetched, errors = await openlibrary.fetch_books([isbn for isbn in isbns if isbn not in stored])
+    entries = [_remember(isbn, book) for isbn, book in fetched.items()]
+    books.update(fetched)
+
+    if _store and entries:
+        await asyncio.to_thread(_store.set_many, entries)
+    return books, errors
+
+async def fetch_books(isbns: list[str]) -> tuple[dict[str, schemas.BookCreate | None], dict[str, str]]:
+    """Same contract as openlibrary.fetch_books, answered from the cache where possible"""
+    books, errors = {}, {}
+    waiting, claimed = {}, {}
+    loop = asyncio.get_running_loop()
+
+    for isbn in dict.fromkeys(isbns):
+        cached = _memory.get(isbn)
+        if cached is not cache.MISSING:
+            books[isbn] = _copy(cached)
+        elif isbn in _in_flight:
+            waiting[isbn] = _in_flight[isbn]
+        else:
+            #claim before the first await so concurrent callers wait on this lookup instead of repeating it
+            claimed[isbn] = _in_flight[isbn] = loop.create_future()
+
+    try:
+        if claimed:
+            loaded, load_errors = await _load(list(claimed))
+            books.update({isbn: _copy(book) for isbn, book in loaded.items()})
+            errors.update(load_errors)
+            for isbn, future in claimed.items():
+                future.set_result((loaded.get(isbn), load_errors.get(isbn)))
+    finally:
+        for isbn, future in claimed.items():
+            _in_flight.pop(isbn, None)
+            if not future.done():
+                #the lookup raised or was cancelled, release anyone waiting on it
+                future.set_result((None, "Lookup failed"))
+
+    for isbn, future in waiting.items():
+        try:
+            book, error = await asyncio.wait_for(asyncio.shield(future), LOOKUP_TIMEOUT)
+        except asyncio.TimeoutError:
+            book, error = None, "Request Time Out"
+        if error:
+            errors[isbn] = error
+        else:
+            books[isbn] = _copy(book)
+
+    return books, errors
+
+async def fetch_book(isbn: str) -> schemas.BookCreate | None:
+    """Same contract as openlibrary.fetch_book, raises OpenLibraryError when the lookup failed"""
+    books, errors = await fetch_books([isbn])
+    if isbn in errors:
+        raise openlibrary.OpenLibraryError(errors[isbn])
+    return books.get(isbn)
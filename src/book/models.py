@@ -1,44 +1,61 @@
-from sqlalchemy import Boolean, Date, ForeignKey, String
-from sqlalchemy.orm import relationship, Mapped, mapped_column
+from sqlalchemy import ForeignKey, Index, String
+from sqlalchemy.orm import relationship, Mapped, mapped_column, validates
 from .. database import Base
-from .. user import models, schemas
+from .. user import models
+from . import isbn as isbn_format, search
 import datetime
 
+def _isbn13_default(context):
+    return isbn_format.normalize_or_none(context.get_current_parameters().get("isbn"))
+
 class Book(Base):
     __tablename__ = "book"
+    __table_args__ = (
+        #backs keyset pagination ordered by (title, id)
+        Index("ix_book_title_id", "title", "id"),
+        #one catalog record per isbn as stored
+        Index("ix_book_isbn", "isbn", unique=True),
+        #lookups by isbn go through the normalized form, so ISBN-10 and ISBN-13 spellings find the same row;
+        #also the conflict target of ingest upserts
+        Index("ix_book_isbn13", "isbn13", unique=True),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, unique=True)
     title: Mapped[str] = mapped_column(String(64))
     author: Mapped[str] = mapped_column(String(64))
     isbn: Mapped[str] = mapped_column(String(13))
+    #ISBN-13 form of isbn, NULL for legacy rows whose isbn isn't valid; core INSERTs get it from the default,
+    #ORM writes from the isbn validator below
+    isbn13: Mapped[str] = mapped_column(String(13), nullable=True, default=_isbn13_default)
     edition: Mapped[str] = mapped_column(String(64), nullable=True)
     publisher: Mapped[str] = mapped_column(String(64), nullable=True)
     publish_date: Mapped[str] = mapped_column(String(64), nullable=True)
     publish_place: Mapped[str] = mapped_column(String(64), nullable=True)
-    number_of_pages: Mapped[str] = mapped_column(nullable=True)
+    number_of_pages: Mapped[int] = mapped_column(nullable=True)
     description: Mapped[str] = mapped_column(String(1024), nullable=True)
     language: Mapped[str] = mapped_column(String(32), nullable=True)
     lccn: Mapped[str] = mapped_column(String(64), nullable=True)
     subtitle: Mapped[str] = mapped_column(String(1024), nullable=True)
     subjects: Mapped[str] = mapped_column(String(256), nullable=True)
+    #sha256 naming the cover in the cover store (src/cover), the image itself never lives in the row
+    cover_hash: Mapped[str] = mapped_column(String(64), nullable=True)
 
-    user_id: Mapped[int] = mapped_column(ForeignKey("user_table.id"), nullable=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("user.id"), nullable=True)
     loan_to_user: Mapped[models.User] = relationship(back_populates="borrowed_books") #implement delete cascade later
 
-    added_date: Mapped[Date] = mapped_column(default=Date.today)
-    borrowed_date: Mapped[Date] = mapped_column(nullable=True)
-    returned_date: Mapped[Date] = mapped_column(nullable=True)
+    added_date: Mapped[datetime.date] = mapped_column(default=datetime.date.today)
+    borrowed_date: Mapped[datetime.date] = mapped_column(nullable=True)
+    returned_date: Mapped[datetime.date] = mapped_column(nullable=True)
     
-    is_borrowed: Mapped[Boolean] = mapped_column(default=False)
-
-    def borrow(self, user: schemas.User):
-        self.loan_to_user = user.email
-        self.borrowed_date = datetime.date.today()
-        self.returned_date = None
-        self.is_borrowed = True
-
-    def return_book(self):
-        self.loan_to_user = None
-        self.borrowed_date = None
-        self.returned_date = datetime.date.today()
-        self.is_borrowed = False
\ No newline at end of file
+    is_borrowed: Mapped[bool] = mapped_column(default=False)
+
+    #bumped by the ORM on every update (and by hand in bulk UPDATE statements), source of the book's ETag
+    version: Mapped[int] = mapped_column(server_default="1")
+    __mapper_args__ = {"version_id_col": version}
+
+    @validates("isbn")
+    def _set_isbn13(self, key, value):
+        self.isbn13 = isbn_format.normalize_or_none(value)
+        return value
+
+search.register_search_ddl(Book.__table__)
@@ -0,0 +1,126 @@
+import asyncio
+
+import httpx
+
+from . import config, constants, schemas
+
+"""Client for the Open Library Read API (https://openlibrary.org/dev/docs/api/read)"""
+
+class OpenLibraryError(Exception):
+    pass
+
+#one pooled client per process, connections are reused across requests and imports
+_client: httpx.AsyncClient | None = None
+
+def get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            base_url=config.OPENLIBRARY_URL,
+            timeout=constants.TIMEOUT,
+            limits=httpx.Limits(max_connections=config.OPENLIBRARY_CONCURRENCY),
+        )
+    return _client
+
+def set_client(client: httpx.AsyncClient):
+    """Replace the shared client, e.g. with one using httpx.MockTransport or an ASGI stand-in in tests"""
+    global _client
+    _client = client
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+def _first(values, default=None):
+    return values[0] if values else default
+
+def parse_record(record: dict, isbn: str | None = None) -> schemas.BookCreate:
+    """Map an Open Library "brief" record onto BookCreate, isbn is used when the record lists none"""
+    data = record.get('data', {})
+    details = record.get('details', {}).get('details', {})
+
+    description = details.get('description')
+    if isinstance(description, dict):
+        description = description.get('value')
+
+    return schemas.BookCreate(
+        title=data.get('title'),
+        author=_first(data.get('authors'), {}).get('name'),
+        edition=details.get('edition_name'),
+        publisher=_first(data.get('publishers'), {}).get('name'),
+        publish_date=_first(record.get('publishDates')),
+        publish_place=_first(data.get('publish_places'), {}).get('name'),
+        number_of_pages=data.get('number_of_pages'),
+        description=description,
+        language=_first(details.get('languages'), {}).get('key'),
+        isbn=_first(record.get('isbns'), isbn),
+        lccn=_first(data.get('identifiers', {}).get('lccn')),
+        subtitle=data.get('subtitle'),
+        subjects=_first(details.get('subjects')),
+    )
+
+def parse_response(content: dict, isbn: str) -> schemas.BookCreate | None:
+    """Return the first record of a response, or None if Open Library doesn't know the isbn"""
+    record = _first(list(content.get('records', {}).values()))
+    if record is None:
+        return None
+
+    return parse_record(record, isbn)
+
+async def _get(url: str) -> dict:
+    try:
+        response = await get_client().get(url)
+        response.raise_for_status()
+    except httpx.TimeoutException:
+        raise OpenLibraryError("Request Time Out")
+    except httpx.HTTPStatusError as error:
+        raise OpenLibraryError(f"Open Library responded with {error.response.status_code}")
+    except httpx.RequestError:
+        raise OpenLibraryError("Request Error")
+    return response.json()
+
+async def fetch_book(isbn: str) -> schemas.BookCreate | None:
+    content = await _get(f"/api/volumes/brief/isbn/{isbn}.json")
+    return parse_response(content, isbn)
+
+async def _fetch_batch(isbns: list[str]) -> tuple[dict[str, schemas.BookCreate | None], dict[str, str]]:
+    #multi-record lookup, the response is keyed by the identifiers exactly as requested
+    content = await _get("/api/volumes/brief/json/" + "|".join(f"isbn:{isbn}" for isbn in isbns))
+
+    books, errors = {}, {}
+    for isbn in isbns:
+        try:
+            books[isbn] = parse_response(content.get(f"isbn:{isbn}", {}), isbn)
+        except ValueError:
+            #pydantic ValidationError, the record lacks fields BookCreate requires
+            errors[isbn] = "Incomplete Open Library record"
+    return books, errors
+
+async def fetch_books(isbns: list[str]) -> tuple[dict[str, schemas.BookCreate | None], dict[str, str]]:
+    """Fetch many ISBNs in batched requests, at most OPENLIBRARY_CONCURRENCY at a time.
+    Returns (books, errors): books maps isbn to its record or None when unknown,
+    errors maps isbn to a message when it couldn't be fetched or parsed"""
+    semaphore = asyncio.Semaphore(config.OPENLIBRARY_CONCURRENCY)
+    books: dict[str, schemas.BookCreate | None] = {}
+    errors: dict[str, str] = {}
+
+    async def run_batch(batch: list[str]):
+        async with semaphore:
+            try:
+                batch_books, batch_errors = await _fetch_batch(batch)
+            except OpenLibraryError as error:
+                errors.update({isbn: str(error) for isbn in batch})
+                return
+            except ValueError:
+                #the response body wasn't json
+                errors.update({isbn: "Invalid response" for isbn in batch})
+                return
+        books.update(batch_books)
+        errors.update(batch_errors)
+
+    size = constants.OPENLIBRARY_BATCH_SIZE
+    await asyncio.gather(*(run_batch(isbns[start:start + size]) for start in range(0, len(isbns), size)))
+
+    return books, errors
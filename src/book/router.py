@@ -1,31 +1,59 @@
-import json
+from typing import Literal
 
-import httpx
-from fastapi import APIRouter, Depends, HTTPException, Security
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, Security, UploadFile
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.exc import StaleDataError
 
+from .. import etag, fields as sparse_fields
 from ..auth import dependencies
-from ..database import get_db
-from . import crud as crud_books, schemas
+from ..database import get_async_db
+from ..replicas import get_read_db
+from ..responses import model_response
+from . import crud as crud_books, export, ingest, isbn as isbn_format, metadata_cache, openlibrary, schemas, service
+from ..loan import schemas as loan_schemas, service as loan_service
 from ..user import crud as crud_users
 
 router = APIRouter(
     prefix = "/books",
 )
 
-TIMEOUT = 15.0
-
 @router.post(
     "/create",
     response_model=schemas.BookCreate,
     dependencies=[
         Security(dependencies.authorize_current_user, scopes=["admin", "superuser"])
     ])
-def create_book(book: schemas.BookCreate, db: Session = Depends(get_db)):
-    if crud_books.get_book_by_isbn(isbn=book.isbn, db=db):
+async def create_book(book: schemas.BookCreate, db: AsyncSession = Depends(get_async_db)):
+    if await crud_books.get_book_by_isbn(isbn=book.isbn, db=db):
         raise HTTPException(status_code=400, detail="Book already exist")  
 
-    return crud_books.create_book(book=book, db=db)
+    return await crud_books.create_book(book=book, db=db)
+
+#declared before /create/{isbn} so "bulk" isn't captured as an isbn
+@router.post(
+    "/create/bulk",
+    response_model=schemas.BookImportReport,
+    dependencies=[
+        Security(dependencies.authorize_current_user, scopes=["admin", "superuser"])
+    ])
+async def create_books_by_isbn(request: schemas.BookImportRequest, db: AsyncSession = Depends(get_async_db)):
+    return await service.import_isbns(isbns=request.isbns, db=db)
+
+@router.post(
+    "/ingest",
+    response_model=schemas.BookIngestReport,
+    dependencies=[
+        Security(dependencies.authorize_current_user, scopes=["admin", "superuser"])
+    ])
+async def ingest_books(
+    file: UploadFile,
+    format: Literal["csv", "ndjson"] | None = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    #uploads are spooled to a temporary file by starlette, ingest reads it row by row from there
+    format = format or ("csv" if (file.filename or "").lower().endswith(".csv") else "ndjson")
+    return await ingest.ingest(stream=file.file, format=format, db=db)
 
 @router.post(
     "/create/{isbn}", 
@@ -33,47 +61,125 @@ def create_book(book: schemas.BookCreate, db: Session = Depends(get_db)):
     dependencies=[
         Security(dependencies.authorize_current_user, scopes=["admin", "superuser"])
     ])
-async def create_book_by_isbn(isbn: str, db: Session = Depends(get_db)):
+async def create_book_by_isbn(isbn: str, db: AsyncSession = Depends(get_async_db)):
+    if not isbn_format.is_valid(isbn):
+        raise HTTPException(status_code=422, detail="Not a valid ISBN-10 or ISBN-13")
 
-    OPENLIB_URL = f"http://openlibrary.org/api/volumes/brief/isbn/{isbn}.json"
-    
     #request data from external API
-    async with httpx.AsyncClient() as client:
-        try:
-            book_response = await client.get(OPENLIB_URL, timeout=TIMEOUT)
-
-        except httpx.ReadTimeout:
-            raise HTTPException(status_code=400, detail= "Request Time Out") 
-        except httpx.RequestError:
-            raise HTTPException(status_code=400, detail= "Request Error")
-        
-    #retrieve json data from HTTP response object
-    json_content = book_response.json()
-    #convert json data to python dict
-    dict_content = json.loads(json_content)
-
-    OPENLIB_KEY = list(dict_content['records'].keys())
-
-    #select certain book keys
-    selected_keys = {
-        'title': dict_content.get('records', {}).get(f'{OPENLIB_KEY[0]}', {}).get('data', {}).get('title', None),
-        'author': dict_content.get('records', {}).get(f'{OPENLIB_KEY[0]}', {}).get('data', {}).get('authors', [{}])[0].get('name', None),
-        'edition': dict_content.get('records', {}).get(f'{OPENLIB_KEY[0]}', {}).get('details', {}).get('details', {}).get('edition_name', None),
-        'publisher': dict_content.get('records', {}).get(f'{OPENLIB_KEY[0]}', {}).get('data', {}).get('publishers', [{}])[0].get('name', None),
-        'publish_date': dict_content.get('records', {}).get(f'{OPENLIB_KEY[0]}', {}).get('publishDates', [None])[0],
-        'publish_place': dict_content.get('records', {}).get(f'{OPENLIB_KEY[0]}', {}).get('data', {}).get('publish_places', [{}])[0].get('name', None),
-        'number_of_pages': dict_content.get('records', {}).get(f'{OPENLIB_KEY[0]}', {}).get('data', {}).get('number_of_pages', None),
-        'description': dict_content.get('records', {}).get(f'{OPENLIB_KEY[0]}', {}).get('details', {}).get('details', {}).get('description', {}).get('value', None),
-        'language': dict_content.get('records', {}).get(f'{OPENLIB_KEY[0]}', {}).get('details', {}).get('details', {}).get('languages', [{}])[0].get('key', None),
-        'isbn': dict_content.get('records', {}).get(f'{OPENLIB_KEY[0]}', {}).get('isbns', [None])[0],
-        'lccn': dict_content.get('records', {}).get(f'{OPENLIB_KEY[0]}', {}).get('data', {}).get('identifiers', {}).get('lccn', None)[0],
-        'subtitle': dict_content.get('records', {}).get(f'{OPENLIB_KEY[0]}', {}).get('data', {}).get('subtitle', None),
-        'subjects':  dict_content.get('records', {}).get(f'{OPENLIB_KEY[0]}', {}).get('details', {}).get('details', {}).get('subjects', None)[0],
-}     
-    #convert python dict to pydantic object
-    book = schemas.BookCreate(**selected_keys)
-
-    return crud_books.create_book(book=book, db=db)
+    try:
+        book = await metadata_cache.fetch_book(isbn)
+    except openlibrary.OpenLibraryError as error:
+        raise HTTPException(status_code=400, detail=str(error))
+
+    if not book:
+        raise HTTPException(status_code=404, detail="Book not found on Open Library")
+    if await crud_books.get_book_by_isbn(isbn=book.isbn, db=db):
+        raise HTTPException(status_code=400, detail="Book already exist")
+
+    return await crud_books.create_book(book=book, db=db)
+
+def book_page_response(db_books, next_cursor: str | None, selected_fields: list[str] | None, headers: dict | None = None):
+    #pages are validated once here and serialized directly, not again through response_model
+    if selected_fields is None:
+        page = schemas.BookPage(items=db_books, next_cursor=next_cursor)
+    else:
+        page = schemas.BookFieldsPage(items=db_books, next_cursor=next_cursor)
+    return model_response(page, headers=headers)
+
+@router.get(
+    "/search",
+    response_model=schemas.BookPage,
+    dependencies=[
+        Security(dependencies.authorize_current_user, scopes=["user", "admin", "superuser"]),
+    ])
+async def search_books(
+    q: str = Query(..., min_length=1, max_length=256),
+    language: str | None = None,
+    is_borrowed: bool | None = None,
+    limit: int = Query(10, ge=1, le=100),
+    cursor: str | None = None,
+    fields: str | None = Query(None, description="comma separated columns to return, e.g. id,title,isbn"),
+    db: AsyncSession = Depends(get_read_db)
+):
+    try:
+        selected_fields = sparse_fields.parse_fields(fields, crud_books.BOOK_FIELDS)
+    except ValueError as error:
+        raise HTTPException(status_code=400, detail=str(error))
+
+    try:
+        db_books, next_cursor = await crud_books.search_books(
+            query=q, language=language, is_borrowed=is_borrowed, limit=limit, cursor=cursor, fields=selected_fields, db=db
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return book_page_response(db_books, next_cursor, selected_fields)
+
+@router.get(
+    "/export",
+    dependencies=[
+        Security(dependencies.authorize_current_user, scopes=["admin", "superuser"]),
+    ])
+async def export_books(format: Literal["ndjson", "csv"] = "ndjson", fields: str | None = None, gzip: bool = False):
+    try:
+        selected_fields = export.parse_fields(fields)
+    except ValueError as error:
+        raise HTTPException(status_code=400, detail=str(error))
+
+    filename = f"books.{format}" + (".gz" if gzip else "")
+    return StreamingResponse(
+        export.export_stream(selected_fields, format=format, compress=gzip),
+        media_type="application/gzip" if gzip else export.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+#declared before /retrieve/{isbn_or_id} so "books" isn't captured as an isbn
+@router.get(
+    "/retrieve/books", 
+    response_model=schemas.BookPage,
+    dependencies=[
+        Security(dependencies.authorize_current_user, scopes=["user", "admin", "superuser"]),
+    ])
+async def get_books(
+    limit: int = Query(10, ge=1, le=100),
+    cursor: str | None = None,
+    order_by: Literal["id", "title"] = "id",
+    fields: str | None = Query(None, description="comma separated columns to return, e.g. id,title,isbn"),
+    if_none_match: str | None = Header(None),
+    db: AsyncSession = Depends(get_read_db)
+):
+    try:
+        selected_fields = sparse_fields.parse_fields(fields, crud_books.BOOK_FIELDS)
+    except ValueError as error:
+        raise HTTPException(status_code=400, detail=str(error))
+
+    try:
+        #the page's ETag only needs (id, version) of its rows, checked before loading them;
+        #each field selection is a different representation with its own ETag
+        etag_prefix = "books" if selected_fields is None else "books:" + ",".join(selected_fields)
+        page_etag = etag.hash_etag(etag_prefix, await crud_books.get_book_page_versions(limit=limit, cursor=cursor, order_by=order_by, db=db))
+        if etag.matches(if_none_match, page_etag):
+            return etag.not_modified(page_etag)
+
+        db_books, next_cursor = await crud_books.get_books(limit=limit, cursor=cursor, order_by=order_by, fields=selected_fields, db=db)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    return book_page_response(db_books, next_cursor, selected_fields, headers={"ETag": page_etag})
+
+#the cache is skipped on purpose: one query per kind of key beats a cache round trip per key
+@router.post(
+    "/retrieve/batch",
+    response_model=schemas.BookBatchResponse,
+    dependencies=[
+        Security(dependencies.authorize_current_user, scopes=["user", "admin", "superuser"]),
+    ])
+async def get_books_by_isbns_ids(request: schemas.BookBatchRequest, db: AsyncSession = Depends(get_read_db)):
+    db_books = await crud_books.get_books_by_isbns_or_ids(keys=request.keys, db=db)
+
+    #duplicate keys get one result each, every result in the order it was asked for
+    results = [schemas.BookLookupResult(key=key, book=db_books.get(key)) for key in request.keys]
+    missing = [key for key in request.keys if key not in db_books]
+    return model_response(schemas.BookBatchResponse(results=results, missing=missing))
 
 @router.get(
     "/retrieve/{isbn_or_id}", 
@@ -81,21 +187,24 @@ async def create_book_by_isbn(isbn: str, db: Session = Depends(get_db)):
     dependencies=[
         Security(dependencies.authorize_current_user, scopes=["user", "admin", "superuser"]), 
         ])
-def get_book_by_isbn_id(isbn_or_id: str, db: Session = Depends(get_db)):
-    db_book = crud_books.get_book_by_isbn_or_id(isbn_or_id=isbn_or_id, db=db)
+async def get_book_by_isbn_id(
+    isbn_or_id: str,
+    response: Response,
+    if_none_match: str | None = Header(None),
+    db: AsyncSession = Depends(get_read_db)
+):
+    #revalidation reads only id and version, the full row is loaded only when it changed
+    if if_none_match:
+        book_version = await crud_books.get_book_version_by_isbn_or_id(isbn_or_id=isbn_or_id, db=db)
+        if book_version and etag.matches(if_none_match, etag.make_etag("book", *book_version)):
+            return etag.not_modified(etag.make_etag("book", *book_version))
+
+    db_book = await crud_books.get_cached_book_by_isbn_or_id(isbn_or_id=isbn_or_id, db=db)
     if not db_book:
         raise HTTPException(status_code=400, detail="Book not found")
-    return db_book
 
-@router.get(
-    "/retrieve/books", 
-    response_model=list[schemas.Book],
-    dependencies=[
-        Security(dependencies.authorize_current_user, scopes=["user", "admin", "superuser"]),
-    ])
-def get_books(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
-    db_books = crud_books.get_books(skip=skip, limit=limit, db=db)
-    return db_books
+    response.headers["ETag"] = etag.make_etag("book", db_book.id, db_book.version)
+    return db_book
 
 @router.patch(
     "/update/{book_id}", 
@@ -103,22 +212,26 @@ def get_books(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
     dependencies=[
         Security(dependencies.authorize_current_user, scopes=["admin", "superuser"]),
     ])
-def update_book(book_id: int, book: schemas.BookUpdate, db: Session = Depends(get_db)):
-    db_book = crud_books.get_book_by_id(book_id=book_id, db=db)
+async def update_book(book_id: int, book: schemas.BookUpdate, db: AsyncSession = Depends(get_async_db)):
+    db_book = await crud_books.get_book_by_id(book_id=book_id, db=db)
     if not db_book:
         raise HTTPException(status_code=400, detail="Book not found")
-    return crud_books.update_book(book_id=book_id, book=book, db=db)
+    try:
+        return await crud_books.update_book(book_id=book_id, book=book, db=db)
+    except StaleDataError:
+        #the version check in the UPDATE failed, someone else changed the book meanwhile
+        raise HTTPException(status_code=409, detail="Book was modified concurrently, retry the update")
 
 @router.delete(
     "/delete/{book_id}",
     dependencies=[
         Security(dependencies.authorize_current_user, scopes=["user", "admin", "superuser"]), 
     ])
-def delete_book(book_id: int, db: Session = Depends(get_db)):
-    db_book = crud_books.get_book_by_id(book_id=book_id, db=db)
+async def delete_book(book_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_book = await crud_books.get_book_by_id(book_id=book_id, db=db)
     if not db_book:
-        HTTPException(status_code=400, detail="Target book does not exist")
-    return crud_books.delete_book(book_id=book_id, db=db)
+        raise HTTPException(status_code=400, detail="Target book does not exist")
+    return await crud_books.delete_book(book_id=book_id, db=db)
 
 
 @router.patch(
@@ -127,18 +240,17 @@ def delete_book(book_id: int, db: Session = Depends(get_db)):
     dependencies=[
         Security(dependencies.authorize_current_user, scopes=["user", "admin", "superuser"]), 
     ])
-def borrow_book(email: str, book_id: int, db: Session = Depends(get_db)):
-    db_user = crud_users.get_user_by_email(email=email, db=db)
-    db_book = crud_books.get_book_by_id(book_id=book_id, db=db)
-    
-    if not (db_user or db_book):
-        raise HTTPException(status_code=400, detail="Target user and book do not exist")
-    if db_book.is_borrowed:
-        raise HTTPException(status_code=400, detail="Book is already borrowed by another user")
-    
-    db_book.borrow(db_user)
+async def borrow_book(email: str, book_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_books, _ = await loan_service.borrow_books(email=email, book_ids=[book_id], db=db)
+    if db_books:
+        return db_books[0]
 
-    return crud_books.update_book(book_id=book_id, book=db_book, db=db)
+    #the conditional update matched nothing, look up why only on this slow path
+    db_user = await crud_users.get_user_by_email(email=email, db=db)
+    db_book = await crud_books.get_book_by_id(book_id=book_id, db=db)
+    if not (db_user and db_book):
+        raise HTTPException(status_code=400, detail="Target user and book do not exist")
+    raise HTTPException(status_code=400, detail="Book is already borrowed by another user")
     
 @router.patch(
     "/return/",
@@ -146,17 +258,39 @@ def borrow_book(email: str, book_id: int, db: Session = Depends(get_db)):
     dependencies=[
         Security(dependencies.authorize_current_user, scopes=["user", "admin", "superuser"]), 
     ])
-def return_book(email: str, book_id: int, db: Session = Depends(get_db)):
-    db_user = crud_users.get_user_by_email(email=email, db=db)
-    db_book = crud_books.get_book_by_id(book_id=book_id, db=db)
-    
-    if not (db_user or db_book):
+async def return_book(email: str, book_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_books, _ = await loan_service.return_books(email=email, book_ids=[book_id], db=db)
+    if db_books:
+        return db_books[0]
+
+    db_user = await crud_users.get_user_by_email(email=email, db=db)
+    db_book = await crud_books.get_book_by_id(book_id=book_id, db=db)
+    if not (db_user and db_book):
         raise HTTPException(status_code=400, detail="Target user and book do not exist")
     if not db_book.is_borrowed:
         raise HTTPException(status_code=400, detail="Target book has not been borrowed")
-    if db_book.loan_to_user != email:
-         raise HTTPException(status_code=400, detail="User did not borrow this specific book")
-    
-    db_book.return_book()
-     
-    return crud_books.update_book(book_id=book_id, book=db_book, db=db)
\ No newline at end of file
+    raise HTTPException(status_code=400, detail="User did not borrow this specific book")
+
+@router.patch(
+    "/borrow/batch",
+    response_model=loan_schemas.LoanBatchResult,
+    dependencies=[
+        Security(dependencies.authorize_current_user, scopes=["user", "admin", "superuser"]), 
+    ])
+async def borrow_books(request: loan_schemas.LoanBatchRequest, db: AsyncSession = Depends(get_async_db)):
+    db_books, rejected = await loan_service.borrow_books(
+        email=request.email, book_ids=request.book_ids, all_or_nothing=request.all_or_nothing, db=db
+    )
+    return loan_schemas.LoanBatchResult(books=db_books, rejected=rejected)
+
+@router.patch(
+    "/return/batch",
+    response_model=loan_schemas.LoanBatchResult,
+    dependencies=[
+        Security(dependencies.authorize_current_user, scopes=["user", "admin", "superuser"]), 
+    ])
+async def return_books(request: loan_schemas.LoanBatchRequest, db: AsyncSession = Depends(get_async_db)):
+    db_books, rejected = await loan_service.return_books(
+        email=request.email, book_ids=request.book_ids, all_or_nothing=request.all_or_nothing, db=db
+    )
+    return loan_schemas.LoanBatchResult(books=db_books, rejected=rejected)
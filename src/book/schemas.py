@@ -1,21 +1,36 @@
-from pydantic import BaseModel
+from enum import Enum
+from typing import Any
+
+from pydantic import BaseModel, ConfigDict, Field, computed_field, field_validator
 from datetime import date
 
-"""class inherits from BookBase will also inherit the Config"""
+from ..cover import constants as cover_constants
+from . import constants, isbn as isbn_format
+
+"""class inherits from BookBase will also inherit the model_config"""
 class BookBase(BaseModel):
     title: str
     author: str | None
     isbn: str 
 
-    class Config:
-        orm_mode = True
+    #read straight from ORM objects
+    model_config = ConfigDict(from_attributes=True)
 
 class BookMetadata(BookBase):
     id: int
+    isbn13: str | None = None
     added_date: date
     borrowed_date: date | None = None 
     returned_date: date | None = None
     is_borrowed: bool
+    version: int
+    #sha256 of the cover in the cover store, images themselves are only served by the cover endpoint
+    cover_hash: str | None = None
+
+    @computed_field
+    @property
+    def cover_url(self) -> str | None:
+        return f"{cover_constants.COVER_URL_PREFIX}/{self.cover_hash}" if self.cover_hash else None
 
 class BookInfo(BookBase):
     edition: str | None = None
@@ -28,11 +43,30 @@ class BookInfo(BookBase):
     lccn: str | None = None 
     subtitle: str | None = None 
     subjects: str | None = None
-    cover_image: bytes | None = None
     user_id: int | None = None
 
+#full representation of a stored book, returned by the retrieve endpoints
+class Book(BookMetadata, BookInfo):
+    pass
+
+#one page of a keyset paginated listing, pass next_cursor back to get the following page
+class BookPage(BaseModel):
+    items: list[Book]
+    next_cursor: str | None = None
+
+#a page restricted to the columns asked for with fields=, items hold only those keys
+class BookFieldsPage(BaseModel):
+    items: list[dict[str, Any]]
+    next_cursor: str | None = None
+
+def validate_isbn(value: str):
+    #stored without separators, the checksum must hold
+    if not isbn_format.is_valid(value):
+        raise ValueError("Not a valid ISBN-10 or ISBN-13")
+    return isbn_format.clean(value)
+
 #ONLY BOOK WITH ISBN IS ALLOWED TO BE CREATED
-class BookCreate(BookBase, BookInfo):
+class BookCreate(BookInfo):
     """    
     title: str
     author: str | None
@@ -47,11 +81,11 @@ class BookCreate(BookBase, BookInfo):
     lccn: str | None = None 
     subtitle: str | None = None 
     subjects: str | None = None
-    cover_image: bytes | None = None
     user_id: int | None = None 
     """
-    pass
-class BookUpdate(BookBase, BookInfo):
+    validate_isbn = field_validator("isbn")(validate_isbn)
+
+class BookUpdate(BookInfo):
     """    
     title: str
     author: str | None
@@ -66,10 +100,52 @@ class BookUpdate(BookBase, BookInfo):
     lccn: str | None = None 
     subtitle: str | None = None 
     subjects: str | None = None
-    cover_image: bytes | None = None
     user_id: int | None = None 
     """
-    pass
+    validate_isbn = field_validator("isbn")(validate_isbn)
+
+class BookBatchRequest(BaseModel):
+    #ids and ISBNs may be mixed, as accepted by /retrieve/{isbn_or_id}
+    keys: list[str] = Field(..., min_length=1, max_length=constants.BATCH_LOOKUP_MAX_KEYS)
+
+class BookLookupResult(BaseModel):
+    key: str
+    book: Book | None = None
+
+#one result per requested key in request order, book is None for keys that matched nothing
+class BookBatchResponse(BaseModel):
+    results: list[BookLookupResult]
+    missing: list[str]
+
+class BookImportRequest(BaseModel):
+    isbns: list[str] = Field(..., min_length=1, max_length=constants.BULK_IMPORT_MAX_ISBNS)
+
+class BookImportStatus(str, Enum):
+    CREATED = "created"
+    EXISTS = "exists"
+    NOT_FOUND = "not_found"
+    FAILED = "failed"
+
+class BookImportResult(BaseModel):
+    isbn: str
+    status: BookImportStatus
+    book_id: int | None = None
+    detail: str | None = None
 
+class BookImportReport(BaseModel):
+    created: int
+    skipped: int
+    failed: int
+    results: list[BookImportResult]
 
+class BookIngestError(BaseModel):
+    line: int
+    detail: str
 
+class BookIngestReport(BaseModel):
+    processed: int = 0
+    upserted: int = 0
+    rejected: int = 0
+    #rows replaced by a later row with the same isbn in their batch
+    superseded: int = 0
+    errors: list[BookIngestError] = []
@@ -0,0 +1,62 @@
+from sqlalchemy import DDL, event, func, literal_column
+from sqlalchemy.dialects.postgresql import TSVECTOR
+
+"""Full-text search over the catalog.
+
+PostgreSQL keeps a generated, weighted tsvector column on book with a GIN index.
+SQLite (local development and tests) keeps an FTS5 external-content table in sync through triggers.
+Both are created by the alembic migration, the DDL below mirrors it for metadata.create_all()"""
+
+SEARCH_CONFIG = "english"
+
+POSTGRES_SEARCH_DDL = [
+    f"""ALTER TABLE book ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(author, '')), 'A') ||
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(subtitle, '')), 'B') ||
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(subjects, '')), 'C') ||
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(description, '')), 'D')
+    ) STORED""",
+    "CREATE INDEX ix_book_search_vector ON book USING GIN (search_vector)",
+]
+
+SQLITE_SEARCH_DDL = [
+    """CREATE VIRTUAL TABLE book_fts USING fts5(
+        title, author, subtitle, subjects, description, content='book', content_rowid='id'
+    )""",
+    """CREATE TRIGGER book_fts_ai AFTER INSERT ON book BEGIN
+        INSERT INTO book_fts(rowid, title, author, subtitle, subjects, description)
+        VALUES (new.id, new.title, new.author, new.subtitle, new.subjects, new.description);
+    END""",
+    """CREATE TRIGGER book_fts_ad AFTER DELETE ON book BEGIN
+        INSERT INTO book_fts(book_fts, rowid, title, author, subtitle, subjects, description)
+        VALUES ('delete', old.id, old.title, old.author, old.subtitle, old.subjects, old.description);
+    END""",
+    #only reindex when searchable text changes, borrow/return updates leave the index alone
+    """CREATE TRIGGER book_fts_au AFTER UPDATE OF title, author, subtitle, subjects, description ON book BEGIN
+        INSERT INTO book_fts(book_fts, rowid, title, author, subtitle, subjects, description)
+        VALUES ('delete', old.id, old.title, old.author, old.subtitle, old.subjects, old.description);
+        INSERT INTO book_fts(rowid, title, author, subtitle, subjects, description)
+        VALUES (new.id, new.title, new.author, new.subtitle, new.subjects, new.description);
+    END""",
+]
+
+def register_search_ddl(table):
+    for statement in POSTGRES_SEARCH_DDL:
+        event.listen(table, "after_create", DDL(statement).execute_if(dialect="postgresql"))
+    for statement in SQLITE_SEARCH_DDL:
+        event.listen(table, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+
+def postgres_match(query: str):
+    """Return (where clause, rank expression), higher rank is a better match"""
+    search_vector = literal_column("book.search_vector", type_=TSVECTOR)
+    tsquery = func.websearch_to_tsquery(SEARCH_CONFIG, query)
+    return search_vector.op("@@")(tsquery), func.ts_rank_cd(search_vector, tsquery)
+
+def sqlite_match(query: str):
+    """Return (where clause, rank expression), the caller joins book_fts on rowid = book.id"""
+    book_fts = literal_column("book_fts")
+    #quote every term so user input can't be parsed as FTS5 query syntax
+    fts_query = " ".join('"' + term.replace('"', '""') + '"' for term in query.split())
+    #bm25() is lower-is-better, negate it to rank the same way as PostgreSQL
+    return book_fts.op("MATCH")(fts_query), -func.bm25(book_fts)
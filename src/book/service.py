@@ -0,0 +1,53 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import crud, isbn as isbn_format, metadata_cache, schemas
+
+async def import_isbns(db: AsyncSession, isbns: list[str]) -> schemas.BookImportReport:
+    """Create books for every ISBN not yet in the catalog, using metadata from Open Library"""
+    Status = schemas.BookImportStatus
+
+    #strip and dedupe while keeping the caller's order for the report
+    requested = list(dict.fromkeys(isbn.strip() for isbn in isbns if isbn.strip()))
+    results: dict[str, schemas.BookImportResult] = {}
+
+    #a wrong check digit is a typo, not something Open Library can answer
+    for isbn in requested:
+        if not isbn_format.is_valid(isbn):
+            results[isbn] = schemas.BookImportResult(isbn=isbn, status=Status.FAILED, detail="Not a valid ISBN-10 or ISBN-13")
+
+    existing = await crud.get_existing_isbns(db=db, isbns=requested)
+    for isbn in existing:
+        results[isbn] = schemas.BookImportResult(isbn=isbn, status=Status.EXISTS)
+
+    fetched, errors = await metadata_cache.fetch_books([isbn for isbn in requested if isbn not in results])
+    for isbn, detail in errors.items():
+        results[isbn] = schemas.BookImportResult(isbn=isbn, status=Status.FAILED, detail=detail)
+
+    #Open Library may answer with a record under another isbn (an edition's other ISBN),
+    #check the isbns it returned as well and never insert the same record twice
+    found = {isbn: book for isbn, book in fetched.items() if book is not None}
+    existing_records = await crud.get_existing_isbns(db=db, isbns=list({book.isbn for book in found.values()}))
+
+    #keyed by isbn13, the ISBN-10 and ISBN-13 requests of one book must create a single row
+    to_create: dict[str, schemas.BookCreate] = {}
+    for isbn, book in fetched.items():
+        if book is None:
+            results[isbn] = schemas.BookImportResult(isbn=isbn, status=Status.NOT_FOUND)
+        elif book.isbn in existing_records or isbn_format.normalize(book.isbn) in to_create:
+            results[isbn] = schemas.BookImportResult(isbn=isbn, status=Status.EXISTS, detail=f"Stored as {book.isbn}")
+        else:
+            to_create[isbn_format.normalize(book.isbn)] = book
+            results[isbn] = schemas.BookImportResult(isbn=isbn, status=Status.CREATED)
+
+    created = await crud.create_books(db=db, books=list(to_create.values()))
+    for isbn, book in found.items():
+        if results[isbn].status == Status.CREATED:
+            results[isbn].book_id = created.get(book.isbn)
+
+    ordered = [results[isbn] for isbn in requested]
+    return schemas.BookImportReport(
+        created=sum(result.status == Status.CREATED for result in ordered),
+        skipped=sum(result.status == Status.EXISTS for result in ordered),
+        failed=sum(result.status in (Status.NOT_FOUND, Status.FAILED) for result in ordered),
+        results=ordered,
+    )
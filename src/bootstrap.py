@@ -0,0 +1,62 @@
+import argparse
+import os
+
+from . import config
+
+"""Schema bootstrap through the Alembic migrations in alembic/versions.
+
+Run it once per deploy, before the workers start, instead of letting every worker create tables:
+
+    python -m src.bootstrap            #upgrade to the latest revision
+    python -m src.bootstrap --check    #exit 1 when the database is behind
+"""
+
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic.ini")
+
+def _alembic_config():
+    #imported here, Alembic is only needed when migrating
+    from alembic.config import Config
+
+    alembic_config = Config(ALEMBIC_INI)
+    #relative to alembic.ini rather than the working directory
+    alembic_config.set_main_option("script_location", os.path.join(os.path.dirname(ALEMBIC_INI), "alembic"))
+    return alembic_config
+
+def upgrade_database(revision: str = "head"):
+    from alembic import command
+
+    command.upgrade(_alembic_config(), revision)
+
+def pending_revisions() -> list[str]:
+    """Revisions between the database's current one and head, oldest first"""
+    from alembic.runtime.migration import MigrationContext
+    from alembic.script import ScriptDirectory
+
+    from .database import get_engine
+
+    script = ScriptDirectory.from_config(_alembic_config())
+    with get_engine().connect() as connection:
+        current = MigrationContext.configure(connection).get_current_heads()
+
+    pending = [revision.revision for revision in script.iterate_revisions("heads", current or "base")]
+    return list(reversed(pending))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m src.bootstrap", description="Migrate the database schema")
+    parser.add_argument("--revision", default="head", help="target revision, head by default")
+    parser.add_argument("--check", action="store_true", help="only report pending migrations")
+    args = parser.parse_args(argv)
+
+    if not config.POSTGRES_DATABASE_URL:
+        parser.error("POSTGRES_DATABASE_URL is not set")
+
+    if args.check:
+        pending = pending_revisions()
+        print(f"Pending migrations: {', '.join(pending)}" if pending else "Database is up to date")
+        return 1 if pending else 0
+
+    upgrade_database(args.revision)
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
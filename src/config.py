@@ -0,0 +1,33 @@
+import os
+
+TRUTHY_VALUES = ("1", "true", "yes", "on")
+
+POSTGRES_DATABASE_URL = os.environ.get("POSTGRES_DATABASE_URL")
+# POSTGRES_FILE_NAME = "user:password@postgresserver/db"
+# POSTGRES_DATABASE_URL = f"postgresql://{POSTGRES_FILE_NAME}"
+ASYNC_POSTGRES_DATABASE_URL = os.environ.get("ASYNC_POSTGRES_DATABASE_URL")
+
+#engine profile, defaults are tuned for production; set DB_ECHO=true while developing
+DB_ECHO = os.environ.get("DB_ECHO", "false").lower() in TRUTHY_VALUES
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", 20))
+#seconds to wait for a connection before QueuePool raises TimeoutError
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", 30))
+#seconds after which a connection is replaced, keep below server/proxy idle timeouts
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", 1800))
+DB_POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING", "true").lower() in TRUTHY_VALUES
+#server side statement_timeout in milliseconds, 0 disables it
+DB_STATEMENT_TIMEOUT_MS = int(os.environ.get("DB_STATEMENT_TIMEOUT_MS", 0))
+#PgBouncer in transaction pooling mode can't keep prepared statements or startup parameters
+DB_PGBOUNCER = os.environ.get("DB_PGBOUNCER", "false").lower() in TRUTHY_VALUES
+#statements slower than this many milliseconds are logged with their SQL, 0 disables the log
+DB_SLOW_QUERY_MS = float(os.environ.get("DB_SLOW_QUERY_MS", 200))
+#run the Alembic migrations when the app starts; meant for development, deploys run "python -m src.bootstrap" once
+DB_MIGRATE_ON_STARTUP = os.environ.get("DB_MIGRATE_ON_STARTUP", "false").lower() in TRUTHY_VALUES
+#read replicas serving the read-only endpoints, comma separated sync or async urls; empty sends every query to the primary
+DB_REPLICA_URLS = [url.strip() for url in os.environ.get("DB_REPLICA_URLS", "").split(",") if url.strip()]
+#seconds between replica health checks, and how long one check may take before the replica counts as down
+DB_REPLICA_CHECK_INTERVAL = float(os.environ.get("DB_REPLICA_CHECK_INTERVAL", 5))
+DB_REPLICA_CHECK_TIMEOUT = float(os.environ.get("DB_REPLICA_CHECK_TIMEOUT", 2))
+#seconds a client keeps reading from the primary after its own write, keep above the usual replication lag
+DB_READ_YOUR_WRITES_SECONDS = int(os.environ.get("DB_READ_YOUR_WRITES_SECONDS", 10))
@@ -0,0 +1,10 @@
+import os
+
+#root of the content-addressed cover store, originals and thumbnails are named by their sha256
+COVER_STORE_PATH = os.environ.get("COVER_STORE_PATH", ".cache/covers")
+#largest accepted upload in bytes
+COVER_MAX_BYTES = int(os.environ.get("COVER_MAX_BYTES", 10 * 1024 * 1024))
+#longest side in pixels of the thumbnails generated for every cover, needs the optional Pillow package
+COVER_THUMBNAIL_SIZES = tuple(int(size) for size in os.environ.get("COVER_THUMBNAIL_SIZES", "64,128,256").split(",") if size.strip())
+#processes resizing covers in the background
+COVER_THUMBNAIL_WORKERS = int(os.environ.get("COVER_THUMBNAIL_WORKERS", 2))
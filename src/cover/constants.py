@@ -0,0 +1,18 @@
+#covers never change under a given hash, clients and proxies may keep them for a year
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+#served in place of a thumbnail that isn't generated yet, so it is revalidated soon
+PENDING_CACHE_CONTROL = "public, max-age=60"
+
+#upload chunk size while hashing and spooling to disk
+CHUNK_SIZE = 64 * 1024
+
+#path prefix of the cover endpoint, embedded in book responses as cover_url
+COVER_URL_PREFIX = "/api/covers"
+
+#leading bytes identifying the accepted image formats
+MEDIA_TYPE_SIGNATURES = [
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+]
@@ -0,0 +1,84 @@
+import asyncio
+import os
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Security, UploadFile
+from fastapi.responses import FileResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import etag
+from ..auth import dependencies
+from ..book import crud as crud_books, schemas as book_schemas
+from ..database import get_async_db
+from . import config, constants, store, thumbnails
+
+router = APIRouter(
+    prefix = "/covers",
+    tags = ["covers"],
+)
+
+@router.put(
+    "/books/{book_id}",
+    response_model=book_schemas.Book,
+    dependencies=[
+        Security(dependencies.authorize_current_user, scopes=["admin", "superuser"]),
+    ])
+async def upload_cover(book_id: int, file: UploadFile, db: AsyncSession = Depends(get_async_db)):
+    if not await crud_books.get_book_by_id(book_id=book_id, db=db):
+        raise HTTPException(status_code=404, detail="Book not found")
+    if file.size is not None and file.size > config.COVER_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"Cover exceeds {config.COVER_MAX_BYTES} bytes")
+
+    try:
+        cover_hash = await store.save(file.file)
+    except store.CoverTooLarge as error:
+        raise HTTPException(status_code=413, detail=str(error))
+    except store.CoverError as error:
+        raise HTTPException(status_code=415, detail=str(error))
+
+    thumbnails.schedule(cover_hash)
+    return await crud_books.set_book_cover(book_id=book_id, cover_hash=cover_hash, db=db)
+
+@router.delete(
+    "/books/{book_id}",
+    response_model=book_schemas.Book,
+    dependencies=[
+        Security(dependencies.authorize_current_user, scopes=["admin", "superuser"]),
+    ])
+async def remove_cover(book_id: int, db: AsyncSession = Depends(get_async_db)):
+    if not await crud_books.get_book_by_id(book_id=book_id, db=db):
+        raise HTTPException(status_code=404, detail="Book not found")
+    #the file stays in the store, other books may share it
+    return await crud_books.set_book_cover(book_id=book_id, cover_hash=None, db=db)
+
+def _resolve(cover_hash: str, size: int | None):
+    """(path, media type, etag, cache control) of the file to serve, or None; runs in a thread as it touches the disk"""
+    if size is not None:
+        path = store.thumbnail_path(cover_hash, size)
+        if os.path.exists(path):
+            return path, "image/jpeg", etag.make_etag(cover_hash, size), constants.IMMUTABLE_CACHE_CONTROL
+
+    path = store.original_path(cover_hash)
+    if not os.path.exists(path):
+        return None
+    #not rendered yet (or Pillow missing): the original for now, briefly cached so the thumbnail is picked up
+    cache_control = constants.IMMUTABLE_CACHE_CONTROL if size is None else constants.PENDING_CACHE_CONTROL
+    return path, store.media_type_of(path), etag.make_etag(cover_hash), cache_control
+
+#public like any <img> source, a hash can only be learnt from a book response
+@router.get("/{cover_hash}")
+async def get_cover(cover_hash: str, size: int | None = None, if_none_match: str | None = Header(default=None)):
+    if not store.is_digest(cover_hash):
+        raise HTTPException(status_code=404, detail="Cover not found")
+    if size is not None and size not in config.COVER_THUMBNAIL_SIZES:
+        raise HTTPException(status_code=400, detail=f"size must be one of {', '.join(map(str, config.COVER_THUMBNAIL_SIZES))}")
+
+    resolved = await asyncio.to_thread(_resolve, cover_hash, size)
+    if resolved is None:
+        raise HTTPException(status_code=404, detail="Cover not found")
+
+    path, media_type, cover_etag, cache_control = resolved
+    if etag.matches(if_none_match, cover_etag):
+        return etag.not_modified(cover_etag, headers={"Cache-Control": cache_control})
+
+    #FileResponse streams the file with sendfile where available and answers Range requests
+    return FileResponse(path, media_type=media_type, headers={"ETag": cover_etag, "Cache-Control": cache_control})
@@ -0,0 +1,89 @@
+import asyncio
+import hashlib
+import os
+import re
+import tempfile
+from typing import BinaryIO
+
+from . import config, constants
+
+"""Content-addressed cover storage.
+
+A cover is stored once under the sha256 of its bytes, however many books use it:
+
+    <COVER_STORE_PATH>/originals/ab/<sha256>
+    <COVER_STORE_PATH>/thumbnails/<size>/ab/<sha256>.jpg
+
+Files are written to a temporary name and moved into place, so readers never see partial files
+and concurrent uploads of the same image simply replace one another with identical content."""
+
+DIGEST_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+class CoverError(ValueError):
+    pass
+
+class CoverTooLarge(CoverError):
+    pass
+
+def is_digest(value: str) -> bool:
+    return bool(DIGEST_PATTERN.match(value))
+
+def original_path(digest: str) -> str:
+    return os.path.join(config.COVER_STORE_PATH, "originals", digest[:2], digest)
+
+def thumbnail_path(digest: str, size: int) -> str:
+    return os.path.join(config.COVER_STORE_PATH, "thumbnails", str(size), digest[:2], f"{digest}.jpg")
+
+def sniff_media_type(head: bytes) -> str | None:
+    for signature, media_type in constants.MEDIA_TYPE_SIGNATURES:
+        if head.startswith(signature):
+            return media_type
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+def media_type_of(path: str) -> str | None:
+    with open(path, "rb") as stream:
+        return sniff_media_type(stream.read(12))
+
+def move_into_place(temporary_path: str, path: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    os.replace(temporary_path, path)
+
+def _save(source: BinaryIO) -> str:
+    directory = os.path.join(config.COVER_STORE_PATH, "tmp")
+    os.makedirs(directory, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+
+    descriptor, temporary_path = tempfile.mkstemp(dir=directory)
+    try:
+        with os.fdopen(descriptor, "wb") as target:
+            while chunk := source.read(constants.CHUNK_SIZE):
+                if size == 0 and sniff_media_type(chunk[:12]) is None:
+                    raise CoverError("Cover must be a JPEG, PNG, GIF or WebP image")
+                size += len(chunk)
+                if size > config.COVER_MAX_BYTES:
+                    raise CoverTooLarge(f"Cover exceeds {config.COVER_MAX_BYTES} bytes")
+                digest.update(chunk)
+                target.write(chunk)
+        if size == 0:
+            raise CoverError("Cover is empty")
+
+        path = original_path(digest.hexdigest())
+        #already stored: the same bytes under the same name, nothing to write
+        if os.path.exists(path):
+            os.unlink(temporary_path)
+        else:
+            move_into_place(temporary_path, path)
+        return digest.hexdigest()
+    except BaseException:
+        if os.path.exists(temporary_path):
+            os.unlink(temporary_path)
+        raise
+
+async def save(source: BinaryIO) -> str:
+    """Store the image read from source, returns its sha256 hex digest.
+    Raises CoverError for non-images and CoverTooLarge past COVER_MAX_BYTES"""
+    #hashing and disk writes stay off the event loop
+    return await asyncio.to_thread(_save, source)
@@ -0,0 +1,66 @@
+import asyncio
+import logging
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from . import config, store
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+"""Thumbnails of every COVER_THUMBNAIL_SIZES size, rendered after an upload in a process pool.
+
+Resizing is CPU bound, so it runs outside the event loop and outside the worker's GIL.
+Without Pillow no thumbnails are generated and the cover endpoint serves the original instead."""
+
+logger = logging.getLogger(__name__)
+
+executor = None
+#futures of renders in progress, kept so they aren't garbage collected before they finish
+_pending = set()
+
+def _render(source_path: str, targets: list[tuple[int, str]]):
+    """Runs in a pool process: write one JPEG thumbnail per (size, path) target"""
+    with Image.open(source_path) as image:
+        image.load()
+        for size, path in targets:
+            thumbnail = image.copy()
+            thumbnail.thumbnail((size, size))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            descriptor, temporary_path = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(descriptor, "wb") as stream:
+                thumbnail.convert("RGB").save(stream, format="JPEG", quality=85, optimize=True)
+            store.move_into_place(temporary_path, path)
+
+def get_executor():
+    global executor
+    if executor is None:
+        executor = ProcessPoolExecutor(max_workers=config.COVER_THUMBNAIL_WORKERS)
+    return executor
+
+def shutdown_executor():
+    global executor
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+        executor = None
+
+def _done(future):
+    _pending.discard(future)
+    if not future.cancelled() and future.exception():
+        logger.error("Generating cover thumbnails failed", exc_info=future.exception())
+
+def schedule(digest: str):
+    """Queue the missing thumbnails of a stored cover, returns immediately"""
+    if Image is None:
+        return
+    targets = [(size, store.thumbnail_path(digest, size)) for size in config.COVER_THUMBNAIL_SIZES]
+    targets = [(size, path) for size, path in targets if not os.path.exists(path)]
+    if not targets:
+        return
+
+    future = asyncio.get_running_loop().run_in_executor(get_executor(), _render, store.original_path(digest), targets)
+    _pending.add(future)
+    future.add_done_callback(_done)
@@ -1,22 +1,210 @@
-from sqlalchemy import create_engine
+import itertools
+import logging
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-import os
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from . import config
+from .monitoring import metrics
+from .monitoring.histogram import Histogram
+
+POSTGRES_DATABASE_URL = config.POSTGRES_DATABASE_URL
+
+#async drivers used when only the sync url is configured, sqlite is supported for local runs and benchmarks
+ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+def _async_url(url: str):
+    url = make_url(url)
+    return url.set(drivername=ASYNC_DRIVERS[url.get_backend_name()]).render_as_string(hide_password=False)
+
+def _replica_url(url: str):
+    #replica urls may be given in either form, only async engines are made for them
+    return url if make_url(url).drivername in ASYNC_DRIVERS.values() else _async_url(url)
+
+logger = logging.getLogger(__name__)
+
+def _database_urls():
+    if not POSTGRES_DATABASE_URL:
+        raise RuntimeError("POSTGRES_DATABASE_URL is not set")
+    #the async engine talks to the same database through asyncpg unless a url is given explicitly
+    return POSTGRES_DATABASE_URL, config.ASYNC_POSTGRES_DATABASE_URL or _async_url(POSTGRES_DATABASE_URL)
+
+class _TimedPoolMixin:
+    """Records how long callers wait for a connection checkout"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_time = Histogram()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self.wait_time.observe(time.perf_counter() - start)
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    pass
+
+class TimedAsyncQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+def _engine_options(url: str, is_async: bool):
+    options = {
+        "echo": config.DB_ECHO,
+        "poolclass": TimedAsyncQueuePool if is_async else TimedQueuePool,
+        "pool_size": config.DB_POOL_SIZE,
+        "max_overflow": config.DB_MAX_OVERFLOW,
+        "pool_timeout": config.DB_POOL_TIMEOUT,
+        "pool_recycle": config.DB_POOL_RECYCLE,
+        "pool_pre_ping": config.DB_POOL_PRE_PING,
+    }
+    connect_args = {}
+
+    if make_url(url).get_backend_name() != "postgresql":
+        #statement timeouts and PgBouncer settings are postgres connection options
+        return options
 
-POSTGRES_DATABASE_URL = os.environ.get("POSTGRES_DATABASE_URL")
-# POSTGRES_FILE_NAME = "user:password@postgresserver/db"
-# POSTGRES_DATABASE_URL = f"postgresql://{POSTGRES_FILE_NAME}"
+    if config.DB_PGBOUNCER:
+        #server side prepared statements don't survive transaction pooling,
+        #statement_timeout has to be configured on the database role instead
+        if is_async:
+            connect_args.update({"statement_cache_size": 0, "prepared_statement_cache_size": 0})
+    elif config.DB_STATEMENT_TIMEOUT_MS:
+        if is_async:
+            connect_args["server_settings"] = {"statement_timeout": str(config.DB_STATEMENT_TIMEOUT_MS)}
+        else:
+            connect_args["options"] = f"-c statement_timeout={config.DB_STATEMENT_TIMEOUT_MS}"
 
-# remove echo=True argument in production
-engine = create_engine(POSTGRES_DATABASE_URL, echo=True) 
+    if connect_args:
+        options["connect_args"] = connect_args
+    return options
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def _before_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+    #the execution context lives exactly as long as one statement, a failed statement is never observed
+    context._query_start_time = time.perf_counter()
+
+def _after_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+    metrics.observe_statement(statement, time.perf_counter() - context._query_start_time)
+
+def _instrument(sync_engine):
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+#engines are created on first use (normally by the app lifespan), so importing the app, the models
+#or a CLI neither loads a database driver nor needs a reachable database
+engine = None
+async_engine = None
+#async engines of DB_REPLICA_URLS, in order; replicas failing their health check are skipped until they pass again
+replica_engines = []
+unhealthy_replicas = set()
+_replica_turn = itertools.count()
+
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
+#expire_on_commit=False so returned models can still be serialized after commit without lazy IO
+AsyncSessionLocal = async_sessionmaker(class_=AsyncSession, autoflush=False, expire_on_commit=False)
 
 Base = declarative_base()
 
+def get_engine():
+    global engine
+    if engine is None:
+        url, _ = _database_urls()
+        engine = create_engine(url, **_engine_options(url, is_async=False))
+        _instrument(engine)
+        SessionLocal.configure(bind=engine)
+    return engine
+
+def get_async_engine():
+    global async_engine
+    if async_engine is None:
+        _, url = _database_urls()
+        async_engine = create_async_engine(url, **_engine_options(url, is_async=True))
+        #events of an AsyncEngine are registered on the sync engine it wraps
+        _instrument(async_engine.sync_engine)
+        AsyncSessionLocal.configure(bind=async_engine)
+    return async_engine
+
+def get_replica_engines():
+    if not replica_engines:
+        for url in config.DB_REPLICA_URLS:
+            url = _replica_url(url)
+            replica_engine = create_async_engine(url, **_engine_options(url, is_async=True))
+            _instrument(replica_engine.sync_engine)
+            replica_engines.append(replica_engine)
+    return replica_engines
+
+def choose_replica():
+    """Next healthy replica engine in round robin order, None when there is none"""
+    healthy = [replica_engine for replica_engine in get_replica_engines() if replica_engine not in unhealthy_replicas]
+    if not healthy:
+        return None
+    return healthy[next(_replica_turn) % len(healthy)]
+
+def mark_replica(replica_engine, healthy: bool):
+    if healthy and replica_engine in unhealthy_replicas:
+        unhealthy_replicas.discard(replica_engine)
+        logger.warning("Read replica %s is back, routing reads to it again", replica_engine.url.render_as_string())
+    elif not healthy and replica_engine not in unhealthy_replicas:
+        unhealthy_replicas.add(replica_engine)
+        logger.warning("Read replica %s is unreachable, its reads go elsewhere", replica_engine.url.render_as_string())
+
+def init_engines():
+    """Create the engines and bind the session factories, safe to call more than once"""
+    get_engine()
+    get_async_engine()
+    get_replica_engines()
+
+async def dispose_engines():
+    """Close pooled connections and forget the engines, the next use creates them again"""
+    global engine, async_engine
+    for replica_engine in replica_engines:
+        await replica_engine.dispose()
+    replica_engines.clear()
+    unhealthy_replicas.clear()
+    if async_engine is not None:
+        await async_engine.dispose()
+        async_engine = None
+    if engine is not None:
+        engine.dispose()
+        engine = None
+
 def get_db():
+    get_engine()
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    get_async_engine()
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def _pool_stats(pool):
+    stats = {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+    }
+    if isinstance(pool, _TimedPoolMixin):
+        stats["wait_time_seconds"] = pool.wait_time.snapshot()
+    return stats
+
+def pool_stats():
+    #engines that haven't been created yet have no pool to report
+    stats = {}
+    if engine is not None:
+        stats["sync"] = _pool_stats(engine.pool)
+    if async_engine is not None:
+        stats["async"] = _pool_stats(async_engine.pool)
+    for index, replica_engine in enumerate(replica_engines):
+        stats[f"replica{index}"] = _pool_stats(replica_engine.pool)
+    return stats
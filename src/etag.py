@@ -0,0 +1,26 @@
+import hashlib
+
+from fastapi import Response
+
+"""Strong ETags built from row versions, and If-None-Match handling"""
+
+def make_etag(*parts) -> str:
+    return '"' + "-".join(str(part) for part in parts) + '"'
+
+def hash_etag(prefix: str, rows) -> str:
+    """ETag for a representation made of several rows, rows is an iterable of (id, version)"""
+    digest = hashlib.sha1(",".join(f"{row_id}:{version}" for row_id, version in rows).encode()).hexdigest()[:20]
+    return make_etag(prefix, digest)
+
+def matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    #If-None-Match uses weak comparison, W/"x" matches "x"
+    candidates = {candidate.strip().removeprefix("W/") for candidate in if_none_match.split(",")}
+    return etag in candidates
+
+def not_modified(etag: str, headers: dict | None = None) -> Response:
+    #a 304 repeats the caching headers the full response would carry (RFC 9111 section 4.3.4)
+    return Response(status_code=304, headers={"ETag": etag, **(headers or {})})
@@ -0,0 +1,13 @@
+"""Sparse fieldsets: "fields=id,title,isbn" query parameters selecting the columns of a representation"""
+
+def parse_fields(fields: str | None, allowed: list[str]) -> list[str] | None:
+    """Validate a comma separated selection against allowed, keeping the caller's order.
+    Returns None when nothing was asked for, raises ValueError on unknown names"""
+    if fields is None:
+        return None
+
+    selected = list(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+    unknown = [name for name in selected if name not in allowed]
+    if unknown or not selected:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}" if unknown else "No fields selected")
+    return selected
@@ -0,0 +1,44 @@
+import argparse
+import asyncio
+import json
+import sys
+
+from ..book.cli import with_database
+from . import overdue
+
+"""Loan maintenance commands, run from the project root:
+
+    python -m src.loan.cli scan-overdue --once     #one scan, prints its report
+    python -m src.loan.cli scan-overdue            #worker process scanning every OVERDUE_SCAN_INTERVAL seconds
+"""
+
+async def scan_once():
+    print(json.dumps(await overdue.scan_overdue()))
+    return 0
+
+async def run_scheduler():
+    overdue.scheduler.start()
+    try:
+        #runs until the process is stopped
+        await asyncio.Event().wait()
+    finally:
+        await overdue.scheduler.stop()
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(prog="python -m src.loan.cli")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    scan_parser = commands.add_parser("scan-overdue", help="send reminders for overdue loans")
+    scan_parser.add_argument("--once", action="store_true", help="run a single scan instead of the scheduler")
+
+    args = parser.parse_args(argv)
+    if args.command == "scan-overdue":
+        if args.once:
+            return asyncio.run(with_database(scan_once()))
+        try:
+            return asyncio.run(with_database(run_scheduler()))
+        except KeyboardInterrupt:
+            return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
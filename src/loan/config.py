@@ -0,0 +1,19 @@
+import os
+
+from ..config import TRUTHY_VALUES
+
+#days a book may be kept, sets the due date of every new loan
+LOAN_PERIOD_DAYS = int(os.environ.get("LOAN_PERIOD_DAYS", 21))
+
+#run the overdue scanner inside the app; enable it in one process only, or run "python -m src.loan.cli scan-overdue" instead
+OVERDUE_SCHEDULER_ENABLED = os.environ.get("OVERDUE_SCHEDULER_ENABLED", "false").lower() in TRUTHY_VALUES
+#seconds between two scans
+OVERDUE_SCAN_INTERVAL = float(os.environ.get("OVERDUE_SCAN_INTERVAL", 3600))
+#seconds before an overdue loan is included in a reminder again
+OVERDUE_REMINDER_INTERVAL = float(os.environ.get("OVERDUE_REMINDER_INTERVAL", 7 * 24 * 3600))
+
+#where notifications go: "log" or "file" (one JSON line per notification in NOTIFICATION_FILE)
+NOTIFICATION_SINK = os.environ.get("NOTIFICATION_SINK", "log")
+NOTIFICATION_FILE = os.environ.get("NOTIFICATION_FILE", ".cache/notifications.ndjson")
+#notifications being sent at once
+NOTIFICATION_CONCURRENCY = int(os.environ.get("NOTIFICATION_CONCURRENCY", 8))
@@ -0,0 +1,12 @@
+#largest cart accepted by the batch borrow/return endpoints
+MAX_BATCH_SIZE = 100
+
+#longest "most borrowed" list and loan history page a report returns
+MAX_REPORT_LIMIT = 100
+#widest date range of the daily circulation report
+MAX_DAILY_REPORT_DAYS = 366
+
+#overdue loans read per keyset query of a scan
+OVERDUE_SCAN_BATCH_SIZE = 1000
+#users whose loan details are loaded and notified together
+NOTIFICATION_BATCH_SIZE = 100
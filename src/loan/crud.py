@@ -0,0 +1,71 @@
+import datetime
+
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import pagination
+from ..book import models as book_models
+from ..user import models as user_models
+from . import models
+
+"""Circulation reports, each one a primary key lookup or a short range of one index"""
+
+async def get_book_stats(db: AsyncSession, book_id: int):
+    return await db.get(models.BookLoanStats, book_id)
+
+async def get_most_borrowed(db: AsyncSession, limit: int = 10):
+    """(stats, title, isbn) of the most borrowed books, read from the top of ix_book_loan_stats_loan_count"""
+    statement = (
+        select(models.BookLoanStats, book_models.Book.title, book_models.Book.isbn)
+        .join(book_models.Book, book_models.Book.id == models.BookLoanStats.book_id)
+        .order_by(models.BookLoanStats.loan_count.desc(), models.BookLoanStats.book_id.desc())
+        .limit(limit)
+    )
+    return (await db.execute(statement)).all()
+
+async def get_user_stats(db: AsyncSession, email: str):
+    """(user id, stats or None) of the user, or None if there is no such user"""
+    statement = (
+        select(user_models.User.id, models.UserLoanStats)
+        .outerjoin(models.UserLoanStats, models.UserLoanStats.user_id == user_models.User.id)
+        .where(user_models.User.email == email)
+    )
+    return (await db.execute(statement)).first()
+
+async def get_daily_stats(db: AsyncSession, start: datetime.date, end: datetime.date):
+    """Counters of the days in [start, end] that had any circulation"""
+    statement = (
+        select(models.DailyLoanStats)
+        .where(models.DailyLoanStats.day >= start, models.DailyLoanStats.day <= end)
+        .order_by(models.DailyLoanStats.day)
+    )
+    return (await db.execute(statement)).scalars().all()
+
+async def get_loan_history(db: AsyncSession, condition, limit: int = 20, cursor: str | None = None):
+    """A page of the loans matching condition (one book or one user), newest first, and the next cursor.
+    Raises ValueError if the cursor is malformed"""
+    statement = select(models.Loan).where(condition).order_by(models.Loan.borrowed_at.desc(), models.Loan.id.desc())
+
+    if cursor:
+        last_key = pagination.decode_cursor("loans", cursor)
+        if len(last_key) != 2:
+            raise ValueError("Malformed cursor")
+        try:
+            last_borrowed_at, last_id = datetime.datetime.fromisoformat(last_key[0]), int(last_key[1])
+        except (TypeError, ValueError):
+            raise ValueError("Malformed cursor")
+        statement = statement.where(tuple_(models.Loan.borrowed_at, models.Loan.id) < tuple_(last_borrowed_at, last_id))
+
+    db_loans = (await db.execute(statement.limit(limit + 1))).scalars().all()
+
+    next_cursor = None
+    if len(db_loans) > limit:
+        db_loans = db_loans[:limit]
+        next_cursor = pagination.encode_cursor("loans", [db_loans[-1].borrowed_at.isoformat(), db_loans[-1].id])
+    return db_loans, next_cursor
+
+async def get_book_loan_history(db: AsyncSession, book_id: int, limit: int = 20, cursor: str | None = None):
+    return await get_loan_history(db, models.Loan.book_id == book_id, limit=limit, cursor=cursor)
+
+async def get_user_loan_history(db: AsyncSession, user_id: int, limit: int = 20, cursor: str | None = None):
+    return await get_loan_history(db, models.Loan.user_id == user_id, limit=limit, cursor=cursor)
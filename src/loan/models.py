@@ -0,0 +1,71 @@
+import datetime
+
+from sqlalchemy import DateTime, ForeignKey, Index, text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from ..database import Base
+
+"""Loan history and the circulation counters derived from it.
+
+Every borrow inserts a Loan and every return closes it, in the same transaction as the
+book UPDATE. The *Stats tables are bumped in that transaction too, so reports read one
+row (or one short index range) however long the history grows."""
+
+class Loan(Base):
+    __tablename__ = "loan"
+    __table_args__ = (
+        #history of one book or one user, newest first
+        Index("ix_loan_book_id_borrowed_at", "book_id", "borrowed_at", "id"),
+        Index("ix_loan_user_id_borrowed_at", "user_id", "borrowed_at", "id"),
+        #at most one open loan per book, also what a return looks up
+        Index(
+            "ix_loan_open_book_id", "book_id", unique=True,
+            postgresql_where=text("returned_at IS NULL"), sqlite_where=text("returned_at IS NULL"),
+        ),
+        #open loans by due date, the overdue scanner walks it in keyset order
+        Index(
+            "ix_loan_open_due_at", "due_at", "id",
+            postgresql_where=text("returned_at IS NULL"), sqlite_where=text("returned_at IS NULL"),
+        ),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    #history goes with the book or user it belongs to
+    book_id: Mapped[int] = mapped_column(ForeignKey("book.id", ondelete="CASCADE"))
+    user_id: Mapped[int] = mapped_column(ForeignKey("user.id", ondelete="CASCADE"))
+    borrowed_at: Mapped[datetime.datetime] = mapped_column(DateTime(timezone=True))
+    returned_at: Mapped[datetime.datetime] = mapped_column(DateTime(timezone=True), nullable=True)
+    #NULL only for loans recorded before due dates existed and already returned
+    due_at: Mapped[datetime.datetime] = mapped_column(DateTime(timezone=True), nullable=True)
+    #last overdue reminder sent for this loan
+    notified_at: Mapped[datetime.datetime] = mapped_column(DateTime(timezone=True), nullable=True)
+
+class BookLoanStats(Base):
+    __tablename__ = "book_loan_stats"
+    __table_args__ = (
+        #"most borrowed" reads the first rows of this index
+        Index("ix_book_loan_stats_loan_count", "loan_count", "book_id"),
+    )
+
+    book_id: Mapped[int] = mapped_column(ForeignKey("book.id", ondelete="CASCADE"), primary_key=True)
+    loan_count: Mapped[int] = mapped_column(default=0)
+    is_on_loan: Mapped[bool] = mapped_column(default=False)
+    last_borrowed_at: Mapped[datetime.datetime] = mapped_column(DateTime(timezone=True), nullable=True)
+
+class UserLoanStats(Base):
+    __tablename__ = "user_loan_stats"
+    __table_args__ = (
+        Index("ix_user_loan_stats_active_loans", "active_loans", "user_id"),
+    )
+
+    user_id: Mapped[int] = mapped_column(ForeignKey("user.id", ondelete="CASCADE"), primary_key=True)
+    loan_count: Mapped[int] = mapped_column(default=0)
+    active_loans: Mapped[int] = mapped_column(default=0)
+
+class DailyLoanStats(Base):
+    __tablename__ = "daily_loan_stats"
+
+    #UTC day
+    day: Mapped[datetime.date] = mapped_column(primary_key=True)
+    borrowed: Mapped[int] = mapped_column(default=0)
+    returned: Mapped[int] = mapped_column(default=0)
@@ -0,0 +1,48 @@
+import asyncio
+import logging
+import os
+
+from . import config, schemas
+
+"""Pluggable destinations for user notifications.
+
+A sink is any object with "async def send(notification)" raising on failure; set_sink() swaps
+the process wide one, e.g. for an email or queue sink, or a recording one in tests."""
+
+logger = logging.getLogger(__name__)
+
+class LogSink:
+    async def send(self, notification: schemas.OverdueNotification):
+        logger.info("Overdue reminder for %s: %s", notification.email, notification.model_dump_json())
+
+class FileSink:
+    """Appends one JSON line per notification, for local runs and tests"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = asyncio.Lock()
+
+    def _append(self, line: str):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as stream:
+            stream.write(line + "\n")
+
+    async def send(self, notification: schemas.OverdueNotification):
+        #one writer at a time keeps lines whole
+        async with self._lock:
+            await asyncio.to_thread(self._append, notification.model_dump_json())
+
+def create_sink():
+    if config.NOTIFICATION_SINK == "file":
+        return FileSink(config.NOTIFICATION_FILE)
+    if config.NOTIFICATION_SINK == "log":
+        return LogSink()
+    raise ValueError(f"Unknown NOTIFICATION_SINK: {config.NOTIFICATION_SINK}")
+
+sink = create_sink()
+
+def set_sink(new_sink):
+    global sink
+    sink = new_sink
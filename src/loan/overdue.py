@@ -0,0 +1,154 @@
+import asyncio
+import datetime
+import logging
+
+from sqlalchemy import or_, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..book import models as book_models
+from ..database import AsyncSessionLocal
+from ..user import models as user_models
+from . import config, constants, models, notifications, schemas
+
+"""Overdue loan reminders.
+
+A scan walks ix_loan_open_due_at (open loans by due date) in keyset ordered batches up to now,
+reading only (loan id, user id), and handles each batch before reading the next one. The users
+of a batch are handled NOTIFICATION_BATCH_SIZE at a time: all of their overdue loans are claimed
+by setting notified_at, their details loaded in one query, and one notification per user is sent
+through notifications.sink, at most NOTIFICATION_CONCURRENCY at a time. Claimed loans no longer
+match the walk, so a user whose loans span several batches is notified once. Claiming first also
+makes concurrent scanners skip each other's loans; a failed send releases its claim so the next
+scan retries it."""
+
+logger = logging.getLogger(__name__)
+
+def _reminder_due(now: datetime.datetime):
+    cutoff = now - datetime.timedelta(seconds=config.OVERDUE_REMINDER_INTERVAL)
+    return or_(models.Loan.notified_at.is_(None), models.Loan.notified_at < cutoff)
+
+async def _overdue_batch(db: AsyncSession, now: datetime.datetime, last_key):
+    statement = (
+        select(models.Loan.due_at, models.Loan.id, models.Loan.user_id)
+        .where(models.Loan.returned_at.is_(None), models.Loan.due_at < now, _reminder_due(now))
+        .order_by(models.Loan.due_at, models.Loan.id)
+        .limit(constants.OVERDUE_SCAN_BATCH_SIZE)
+    )
+    if last_key:
+        statement = statement.where(tuple_(models.Loan.due_at, models.Loan.id) > tuple_(*last_key))
+    return (await db.execute(statement)).all()
+
+async def _claim(db: AsyncSession, user_ids: list[int], now: datetime.datetime) -> list[int]:
+    """Claim every overdue loan of the users, including those further along the walk"""
+    statement = (
+        update(models.Loan)
+        .where(models.Loan.user_id.in_(user_ids), models.Loan.returned_at.is_(None), models.Loan.due_at < now, _reminder_due(now))
+        .values(notified_at=now)
+        .returning(models.Loan.id)
+    )
+    claimed = (await db.execute(statement)).scalars().all()
+    await db.commit()
+    return claimed
+
+async def _release(db: AsyncSession, loan_ids: list[int], now: datetime.datetime):
+    #only our own claim is undone; an earlier reminder's timestamp is lost, so the loan is reminded again next scan
+    await db.execute(update(models.Loan).where(models.Loan.id.in_(loan_ids), models.Loan.notified_at == now).values(notified_at=None))
+    await db.commit()
+
+async def _build_notifications(db: AsyncSession, loan_ids: list[int], now: datetime.datetime):
+    statement = (
+        select(models.Loan, book_models.Book.title, book_models.Book.isbn, user_models.User.email, user_models.User.name)
+        .join(book_models.Book, book_models.Book.id == models.Loan.book_id)
+        .join(user_models.User, user_models.User.id == models.Loan.user_id)
+        .where(models.Loan.id.in_(loan_ids))
+        .order_by(models.Loan.user_id, models.Loan.due_at)
+    )
+    built: dict[int, schemas.OverdueNotification] = {}
+    for loan, title, isbn, email, name in (await db.execute(statement)).all():
+        notification = built.setdefault(loan.user_id, schemas.OverdueNotification(user_id=loan.user_id, email=email, name=name, loans=[]))
+        due_at = loan.due_at if loan.due_at.tzinfo else loan.due_at.replace(tzinfo=datetime.timezone.utc)
+        notification.loans.append(schemas.OverdueLoan(
+            loan_id=loan.id, book_id=loan.book_id, title=title, isbn=isbn, due_at=due_at, days_overdue=(now - due_at).days,
+        ))
+    return list(built.values())
+
+async def _send_all(notification_list: list[schemas.OverdueNotification]) -> list[schemas.OverdueNotification]:
+    """Send with bounded concurrency, returns the notifications that failed"""
+    semaphore = asyncio.Semaphore(config.NOTIFICATION_CONCURRENCY)
+    sink = notifications.sink
+
+    async def send(notification):
+        async with semaphore:
+            try:
+                await sink.send(notification)
+            except Exception:
+                logger.exception("Sending the overdue reminder to user %s failed", notification.user_id)
+                return notification
+            return None
+
+    results = await asyncio.gather(*(send(notification) for notification in notification_list))
+    return [notification for notification in results if notification is not None]
+
+async def scan_overdue(now: datetime.datetime | None = None) -> dict[str, int]:
+    """Run one scan, returns counts of users notified and failed and of loans covered"""
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    report = {"users": 0, "loans": 0, "failed": 0}
+    #users whose send failed are not retried later in the same scan
+    failed_users = set()
+
+    async with AsyncSessionLocal() as db:
+        last_key = None
+        while True:
+            rows = await _overdue_batch(db, now, last_key)
+            user_ids = [user_id for user_id in dict.fromkeys(user_id for _, _, user_id in rows) if user_id not in failed_users]
+
+            for start in range(0, len(user_ids), constants.NOTIFICATION_BATCH_SIZE):
+                claimed = await _claim(db, user_ids[start:start + constants.NOTIFICATION_BATCH_SIZE], now)
+                if not claimed:
+                    continue
+
+                built = await _build_notifications(db, claimed, now)
+                failed = await _send_all(built)
+                if failed:
+                    await _release(db, [loan.loan_id for notification in failed for loan in notification.loans], now)
+                    failed_users.update(notification.user_id for notification in failed)
+
+                report["users"] += len(built) - len(failed)
+                report["loans"] += sum(len(notification.loans) for notification in built if notification not in failed)
+                report["failed"] += len(failed)
+
+            if len(rows) < constants.OVERDUE_SCAN_BATCH_SIZE:
+                return report
+            last_key = rows[-1][:2]
+
+class OverdueScheduler:
+    """Runs scan_overdue every OVERDUE_SCAN_INTERVAL seconds in a background task"""
+
+    def __init__(self, interval: float = config.OVERDUE_SCAN_INTERVAL):
+        self.interval = interval
+        self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                report = await scan_overdue()
+                logger.info("Overdue scan: %s", report)
+            except Exception:
+                #a failed scan (database down, ...) is retried at the next tick
+                logger.exception("Overdue scan failed")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+scheduler = OverdueScheduler()
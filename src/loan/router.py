@@ -0,0 +1,110 @@
+import datetime
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Security
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..auth import dependencies
+from ..book import crud as crud_books
+from ..database import get_async_db
+from . import constants, crud, schemas
+
+router = APIRouter(
+    prefix = "/loans",
+    tags = ["loans"],
+)
+
+@router.get(
+    "/stats/books/top",
+    response_model=list[schemas.MostBorrowedBook],
+    dependencies=[
+        Security(dependencies.authorize_current_user, scopes=["admin", "superuser"]),
+    ])
+async def get_most_borrowed(limit: int = Query(10, ge=1, le=constants.MAX_REPORT_LIMIT), db: AsyncSession = Depends(get_async_db)):
+    rows = await crud.get_most_borrowed(limit=limit, db=db)
+    return [
+        schemas.MostBorrowedBook(**schemas.BookLoanStats.model_validate(stats).model_dump(), title=title, isbn=isbn)
+        for stats, title, isbn in rows
+    ]
+
+@router.get(
+    "/stats/books/{book_id}",
+    response_model=schemas.BookLoanStats,
+    dependencies=[
+        Security(dependencies.authorize_current_user, scopes=["user", "admin", "superuser"]),
+    ])
+async def get_book_stats(book_id: int, db: AsyncSession = Depends(get_async_db)):
+    stats = await crud.get_book_stats(book_id=book_id, db=db)
+    if stats:
+        return stats
+
+    #a book that was never lent has no counters yet
+    if not await crud_books.get_book_by_id(book_id=book_id, db=db):
+        raise HTTPException(status_code=404, detail="Book not found")
+    return schemas.BookLoanStats(book_id=book_id)
+
+@router.get(
+    "/stats/users/{email}",
+    response_model=schemas.UserLoanStats,
+    dependencies=[
+        Security(dependencies.authorize_current_user, scopes=["user", "admin", "superuser"]),
+        Depends(dependencies.confirm_user_authorization)
+    ])
+async def get_user_stats(email: str, db: AsyncSession = Depends(get_async_db)):
+    row = await crud.get_user_stats(email=email, db=db)
+    if not row:
+        raise HTTPException(status_code=404, detail="Target user does not exist")
+
+    user_id, stats = row
+    return stats or schemas.UserLoanStats(user_id=user_id)
+
+@router.get(
+    "/stats/daily",
+    response_model=list[schemas.DailyLoanStats],
+    dependencies=[
+        Security(dependencies.authorize_current_user, scopes=["admin", "superuser"]),
+    ])
+async def get_daily_stats(start: datetime.date, end: datetime.date, db: AsyncSession = Depends(get_async_db)):
+    if end < start or (end - start).days >= constants.MAX_DAILY_REPORT_DAYS:
+        raise HTTPException(status_code=400, detail=f"Date range must be ordered and span at most {constants.MAX_DAILY_REPORT_DAYS} days")
+    return await crud.get_daily_stats(start=start, end=end, db=db)
+
+@router.get(
+    "/history/books/{book_id}",
+    response_model=schemas.LoanPage,
+    dependencies=[
+        Security(dependencies.authorize_current_user, scopes=["admin", "superuser"]),
+    ])
+async def get_book_loan_history(
+    book_id: int,
+    limit: int = Query(20, ge=1, le=constants.MAX_REPORT_LIMIT),
+    cursor: str | None = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    try:
+        db_loans, next_cursor = await crud.get_book_loan_history(book_id=book_id, limit=limit, cursor=cursor, db=db)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return schemas.LoanPage(items=db_loans, next_cursor=next_cursor)
+
+@router.get(
+    "/history/users/{email}",
+    response_model=schemas.LoanPage,
+    dependencies=[
+        Security(dependencies.authorize_current_user, scopes=["user", "admin", "superuser"]),
+        Depends(dependencies.confirm_user_authorization)
+    ])
+async def get_user_loan_history(
+    email: str,
+    limit: int = Query(20, ge=1, le=constants.MAX_REPORT_LIMIT),
+    cursor: str | None = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    row = await crud.get_user_stats(email=email, db=db)
+    if not row:
+        raise HTTPException(status_code=404, detail="Target user does not exist")
+
+    try:
+        db_loans, next_cursor = await crud.get_user_loan_history(user_id=row[0], limit=limit, cursor=cursor, db=db)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return schemas.LoanPage(items=db_loans, next_cursor=next_cursor)
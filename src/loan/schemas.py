@@ -0,0 +1,72 @@
+from datetime import date, datetime
+
+from pydantic import BaseModel, ConfigDict, Field
+
+from ..book import schemas
+from . import constants
+
+class LoanBatchRequest(BaseModel):
+    email: str
+    book_ids: list[int] = Field(..., min_length=1, max_length=constants.MAX_BATCH_SIZE)
+    #roll the whole cart back if any book can't be processed
+    all_or_nothing: bool = False
+
+class LoanBatchResult(BaseModel):
+    books: list[schemas.BookUpdate]
+    rejected: list[int]
+
+class Loan(BaseModel):
+    id: int
+    book_id: int
+    user_id: int
+    borrowed_at: datetime
+    due_at: datetime | None = None
+    returned_at: datetime | None = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+#one keyset page of a loan history, newest first
+class LoanPage(BaseModel):
+    items: list[Loan]
+    next_cursor: str | None = None
+
+class BookLoanStats(BaseModel):
+    book_id: int
+    loan_count: int = 0
+    is_on_loan: bool = False
+    last_borrowed_at: datetime | None = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+class MostBorrowedBook(BookLoanStats):
+    title: str
+    isbn: str
+
+class UserLoanStats(BaseModel):
+    user_id: int
+    loan_count: int = 0
+    active_loans: int = 0
+
+    model_config = ConfigDict(from_attributes=True)
+
+class DailyLoanStats(BaseModel):
+    day: date
+    borrowed: int = 0
+    returned: int = 0
+
+    model_config = ConfigDict(from_attributes=True)
+
+class OverdueLoan(BaseModel):
+    loan_id: int
+    book_id: int
+    title: str
+    isbn: str
+    due_at: datetime
+    days_overdue: int
+
+#one message per user, covering all of their overdue loans
+class OverdueNotification(BaseModel):
+    user_id: int
+    email: str
+    name: str
+    loans: list[OverdueLoan]
@@ -0,0 +1,125 @@
+import datetime
+from functools import partial
+
+from sqlalchemy import false, insert, select, true, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..book import cache as book_cache, models as book_models
+from ..user import models as user_models
+from . import config, models
+
+"""Borrow and return as single conditional UPDATE ... RETURNING statements.
+
+The availability check and the write happen in one statement, so two concurrent checkouts
+of the same copy can't both succeed: the second one waits for the first row lock, re-checks
+is_borrowed and matches nothing. A whole cart is processed in one statement and one transaction,
+together with its loan history rows and circulation counters (see loan/models.py)."""
+
+def _user_id(email: str):
+    return select(user_models.User.id).where(user_models.User.email == email).scalar_subquery()
+
+def _insert(db: AsyncSession, model):
+    #INSERT ... ON CONFLICT is dialect specific
+    return (postgresql.insert if db.bind.dialect.name == "postgresql" else sqlite.insert)(model)
+
+async def _count_day(db: AsyncSession, now: datetime.datetime, borrowed: int = 0, returned: int = 0):
+    statement = _insert(db, models.DailyLoanStats).values(day=now.date(), borrowed=borrowed, returned=returned)
+    await db.execute(statement.on_conflict_do_update(
+        index_elements=[models.DailyLoanStats.day],
+        set_={
+            "borrowed": models.DailyLoanStats.borrowed + statement.excluded.borrowed,
+            "returned": models.DailyLoanStats.returned + statement.excluded.returned,
+        },
+    ))
+
+async def _record_borrows(db: AsyncSession, db_books):
+    now = datetime.datetime.now(datetime.timezone.utc)
+    #the UPDATE returned rows in no particular order, counters are locked by ascending book id
+    book_ids = sorted(db_book.id for db_book in db_books)
+    user_id = db_books[0].user_id
+
+    due_at = now + datetime.timedelta(days=config.LOAN_PERIOD_DAYS)
+    await db.execute(
+        insert(models.Loan),
+        [{"book_id": book_id, "user_id": user_id, "borrowed_at": now, "due_at": due_at} for book_id in book_ids],
+    )
+
+    statement = _insert(db, models.BookLoanStats)
+    await db.execute(
+        statement.on_conflict_do_update(
+            index_elements=[models.BookLoanStats.book_id],
+            set_={"loan_count": models.BookLoanStats.loan_count + 1, "is_on_loan": True, "last_borrowed_at": statement.excluded.last_borrowed_at},
+        ),
+        [{"book_id": book_id, "loan_count": 1, "is_on_loan": True, "last_borrowed_at": now} for book_id in book_ids],
+    )
+
+    statement = _insert(db, models.UserLoanStats).values(user_id=user_id, loan_count=len(book_ids), active_loans=len(book_ids))
+    await db.execute(statement.on_conflict_do_update(
+        index_elements=[models.UserLoanStats.user_id],
+        set_={
+            "loan_count": models.UserLoanStats.loan_count + statement.excluded.loan_count,
+            "active_loans": models.UserLoanStats.active_loans + statement.excluded.active_loans,
+        },
+    ))
+    await _count_day(db, now, borrowed=len(book_ids))
+
+async def _record_returns(db: AsyncSession, db_books, email: str):
+    now = datetime.datetime.now(datetime.timezone.utc)
+    book_ids = sorted(db_book.id for db_book in db_books)
+
+    await db.execute(
+        update(models.Loan)
+        .where(models.Loan.book_id.in_(book_ids), models.Loan.returned_at.is_(None))
+        .values(returned_at=now)
+    )
+    await db.execute(update(models.BookLoanStats).where(models.BookLoanStats.book_id.in_(book_ids)).values(is_on_loan=False))
+    await db.execute(
+        update(models.UserLoanStats)
+        .where(models.UserLoanStats.user_id == _user_id(email))
+        .values(active_loans=models.UserLoanStats.active_loans - len(book_ids))
+    )
+    await _count_day(db, now, returned=len(book_ids))
+
+async def _apply(db: AsyncSession, statement, book_ids: list[int], all_or_nothing: bool, record):
+    db_books = (await db.execute(statement)).scalars().all()
+    processed = {db_book.id for db_book in db_books}
+    rejected = [book_id for book_id in dict.fromkeys(book_ids) if book_id not in processed]
+
+    if rejected and all_or_nothing:
+        await db.rollback()
+        return [], list(dict.fromkeys(book_ids))
+
+    if db_books:
+        await record(db, db_books)
+    await db.commit()
+    for db_book in db_books:
+        await book_cache.invalidate(db_book.id, db_book.isbn)
+    return db_books, rejected
+
+async def borrow_books(db: AsyncSession, email: str, book_ids: list[int], all_or_nothing: bool = False):
+    """Lend every available book in book_ids to the user, returns (borrowed books, rejected ids)"""
+    user_id = _user_id(email)
+    statement = (
+        update(book_models.Book)
+        .where(book_models.Book.id.in_(book_ids), book_models.Book.is_borrowed == false(), user_id.is_not(None))
+        .values(
+            user_id=user_id, is_borrowed=True, borrowed_date=datetime.date.today(), returned_date=None,
+            version=book_models.Book.version + 1
+        )
+        .returning(book_models.Book)
+    )
+    return await _apply(db, statement, book_ids, all_or_nothing, _record_borrows)
+
+async def return_books(db: AsyncSession, email: str, book_ids: list[int], all_or_nothing: bool = False):
+    """Take back every book in book_ids currently lent to the user, returns (returned books, rejected ids)"""
+    statement = (
+        update(book_models.Book)
+        .where(book_models.Book.id.in_(book_ids), book_models.Book.is_borrowed == true(), book_models.Book.user_id == _user_id(email))
+        .values(
+            user_id=None, is_borrowed=False, borrowed_date=None, returned_date=datetime.date.today(),
+            version=book_models.Book.version + 1
+        )
+        .returning(book_models.Book)
+    )
+    return await _apply(db, statement, book_ids, all_or_nothing, partial(_record_returns, email=email))
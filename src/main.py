@@ -1,18 +1,48 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from .auth import router as auth_router
-from .book import router as books_router
-from .database import Base, engine
+from . import bootstrap, config, database, replicas
+from .auth import revocation, router as auth_router, service as auth_service
+from .book import cache as book_cache, openlibrary, router as books_router
+from .cover import router as covers_router, thumbnails
+from .loan import config as loan_config, overdue, router as loans_router
+from .monitoring import router as monitoring_router
+from .monitoring.middleware import MetricsMiddleware
+from .responses import DefaultResponse
 from .user import router as users_router
 
-Base.metadata.create_all(engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    #the schema is owned by the Alembic migrations, see src/bootstrap.py
+    if config.DB_MIGRATE_ON_STARTUP:
+        await asyncio.to_thread(bootstrap.upgrade_database)
+    database.init_engines()
+    replicas.monitor.start()
+    await revocation.persister.start()
+    if loan_config.OVERDUE_SCHEDULER_ENABLED:
+        overdue.scheduler.start()
+    yield
+    await overdue.scheduler.stop()
+    await replicas.monitor.stop()
+    await revocation.persister.stop()
+    await openlibrary.close_client()
+    await book_cache.backend.close()
+    auth_service.shutdown_hash_executor()
+    thumbnails.shutdown_executor()
+    await database.dispose_engines()
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan, default_response_class=DefaultResponse)
 
 app.include_router(users_router.router, prefix="/api")
 app.include_router(books_router.router, prefix="/api")
 app.include_router(auth_router.router, prefix="/api")
+app.include_router(loans_router.router, prefix="/api")
+app.include_router(covers_router.router, prefix="/api")
+app.include_router(monitoring_router.router, prefix="/api")
+app.include_router(monitoring_router.metrics_router)
 
 origins = [
     "http://localhost.tiangolo.com",
@@ -29,4 +59,11 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-)
\ No newline at end of file
+)
+
+#only needed when reads can go to a replica
+if config.DB_REPLICA_URLS:
+    app.add_middleware(replicas.ReadYourWritesMiddleware)
+
+#added last so it wraps CORS and measures every request, preflights included
+app.add_middleware(MetricsMiddleware)
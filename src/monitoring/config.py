@@ -0,0 +1,13 @@
+import os
+
+from ..config import TRUTHY_VALUES
+
+#when set, scrapers must send "Authorization: Bearer <METRICS_TOKEN>" to read /metrics
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+
+#allows profiling single requests that send the X-Profile header, needs the optional pyinstrument package
+PROFILING_ENABLED = os.environ.get("PROFILING_ENABLED", "false").lower() in TRUTHY_VALUES
+#directory the HTML profiles are written to
+PROFILE_DIR = os.environ.get("PROFILE_DIR", ".cache/profiles")
+#seconds between profiler samples
+PROFILE_INTERVAL = float(os.environ.get("PROFILE_INTERVAL", 0.001))
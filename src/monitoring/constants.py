@@ -0,0 +1,5 @@
+#upper bounds for the number of SQL statements issued by a single request
+STATEMENT_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+#slow query log lines are cut after this many characters of SQL
+SLOW_QUERY_LOG_MAX_LENGTH = 2000
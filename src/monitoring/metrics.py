@@ -0,0 +1,147 @@
+import contextvars
+import logging
+import threading
+
+from .. import config
+from . import constants
+from .histogram import DEFAULT_BUCKETS, Histogram
+
+"""Process-wide request and SQL metrics rendered in the Prometheus text format.
+
+Every worker process keeps its own registry, scrape each worker or run a single one per target."""
+
+logger = logging.getLogger(__name__)
+
+class _Family:
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...]):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def items(self):
+        with self._lock:
+            return list(self._children.items())
+
+class Counter(_Family):
+    type = "counter"
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._children[labels] = self._children.get(labels, 0) + amount
+
+class Gauge(_Family):
+    type = "gauge"
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._children[labels] = self._children.get(labels, 0) + amount
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+class HistogramFamily(_Family):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...], buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = buckets
+
+    def labels(self, *labels) -> Histogram:
+        with self._lock:
+            histogram = self._children.get(labels)
+            if histogram is None:
+                histogram = self._children[labels] = Histogram(self.buckets)
+            return histogram
+
+    def observe(self, *labels, value: float):
+        self.labels(*labels).observe(value)
+
+http_requests = Counter("http_requests_total", "Finished HTTP requests", ("method", "route", "status"))
+http_requests_in_flight = Gauge("http_requests_in_flight", "HTTP requests being processed", ("method",))
+http_request_duration = HistogramFamily("http_request_duration_seconds", "HTTP request latency including the response body", ("method", "route"))
+http_request_statements = HistogramFamily(
+    "http_request_db_statements", "SQL statements executed per HTTP request", ("method", "route"), constants.STATEMENT_COUNT_BUCKETS,
+)
+db_statement_duration = HistogramFamily("db_statement_duration_seconds", "SQL statement execution time", ("operation",))
+db_slow_statements = Counter("db_slow_statements_total", "SQL statements slower than DB_SLOW_QUERY_MS", ("operation",))
+
+FAMILIES = [
+    http_requests, http_requests_in_flight, http_request_duration, http_request_statements,
+    db_statement_duration, db_slow_statements,
+]
+
+#statement counter of the request being handled, None outside of requests
+_request_statements: contextvars.ContextVar[list[int] | None] = contextvars.ContextVar("request_statements", default=None)
+
+def start_request_statements():
+    """Start counting statements for the current context, returns the counter and a reset token"""
+    counter = [0]
+    return counter, _request_statements.set(counter)
+
+def stop_request_statements(token):
+    _request_statements.reset(token)
+
+def _operation(statement: str) -> str:
+    keyword = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+    return keyword if keyword in ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH") else "OTHER"
+
+def observe_statement(statement: str, elapsed: float):
+    """Record one executed statement, called from the engine's cursor events"""
+    operation = _operation(statement)
+    db_statement_duration.observe(operation, value=elapsed)
+
+    #the counter is a mutable cell so statements run in tasks spawned by the request still count
+    counter = _request_statements.get()
+    if counter is not None:
+        counter[0] += 1
+
+    if config.DB_SLOW_QUERY_MS and elapsed * 1000 >= config.DB_SLOW_QUERY_MS:
+        db_slow_statements.inc(operation)
+        #parameters are left out of the log, they may carry personal data
+        logger.warning("Slow query (%.1f ms): %s", elapsed * 1000, statement[:constants.SLOW_QUERY_LOG_MAX_LENGTH])
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names, values, extra: dict | None = None) -> str:
+    pairs = list(zip(names, values)) + list((extra or {}).items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+def _render_histogram(lines: list[str], name: str, labelnames, labels, snapshot: dict):
+    for bucket in snapshot["buckets"]:
+        lines.append(f"{name}_bucket{_labels(labelnames, labels, {'le': bucket['le']})} {bucket['count']}")
+    lines.append(f"{name}_sum{_labels(labelnames, labels)} {snapshot['sum']}")
+    lines.append(f"{name}_count{_labels(labelnames, labels)} {snapshot['count']}")
+
+def _render_pools(lines: list[str], pools: dict):
+    gauges = {"size": "db_pool_size", "checked_out": "db_pool_checked_out", "overflow": "db_pool_overflow"}
+    for key, name in gauges.items():
+        lines.append(f"# TYPE {name} gauge")
+        for engine_name, stats in pools.items():
+            lines.append(f"{name}{_labels(('engine',), (engine_name,))} {stats[key]}")
+
+    lines.append("# HELP db_pool_checkout_wait_seconds Time spent waiting for a pooled connection")
+    lines.append("# TYPE db_pool_checkout_wait_seconds histogram")
+    for engine_name, stats in pools.items():
+        if "wait_time_seconds" in stats:
+            _render_histogram(lines, "db_pool_checkout_wait_seconds", ("engine",), (engine_name,), stats["wait_time_seconds"])
+
+def render(pools: dict | None = None) -> str:
+    """Prometheus text exposition (version 0.0.4) of every metric family"""
+    lines = []
+    for family in FAMILIES:
+        lines.append(f"# HELP {family.name} {family.help}")
+        lines.append(f"# TYPE {family.name} {family.type}")
+        for labels, value in family.items():
+            if isinstance(family, HistogramFamily):
+                _render_histogram(lines, family.name, family.labelnames, labels, value.snapshot())
+            else:
+                lines.append(f"{family.name}{_labels(family.labelnames, labels)} {value}")
+
+    if pools:
+        _render_pools(lines, pools)
+    return "\n".join(lines) + "\n"
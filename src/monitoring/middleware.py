@@ -0,0 +1,84 @@
+import os
+import time
+import uuid
+
+from . import config, metrics
+
+try:
+    from pyinstrument import Profiler
+except ImportError:
+    Profiler = None
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, in-flight requests, status codes and SQL statement counts per route.
+
+    Routes are labelled with their path template ("/api/books/retrieve/{isbn_or_id}") so ids don't explode
+    the label set. With PROFILING_ENABLED a request sending "X-Profile: 1" is run under the pyinstrument
+    sampling profiler and the report name is returned in the X-Profile response header."""
+
+    def __init__(self, app):
+        self.app = app
+
+    @staticmethod
+    def _route(scope) -> str:
+        #set by the router on the scope to the route that served the request, once routing is done
+        return getattr(scope.get("route"), "path_format", None) or "unmatched"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        method = scope["method"]
+        profiler = self._profiler(scope)
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if profiler:
+                    message["headers"] = [*message.get("headers", []), (b"x-profile", profiler.name.encode())]
+            await send(message)
+
+        #the route is only known after routing, in-flight requests are counted per method
+        metrics.http_requests_in_flight.inc(method)
+        statements, token = metrics.start_request_statements()
+        start = time.perf_counter()
+        if profiler:
+            profiler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            if profiler:
+                profiler.stop()
+            metrics.stop_request_statements(token)
+            metrics.http_requests_in_flight.dec(method)
+            route = self._route(scope)
+            metrics.http_requests.inc(method, route, str(status))
+            metrics.http_request_duration.observe(method, route, value=elapsed)
+            metrics.http_request_statements.observe(method, route, value=statements[0])
+
+    def _profiler(self, scope):
+        if not config.PROFILING_ENABLED or Profiler is None:
+            return None
+        if (b"x-profile", b"1") not in scope.get("headers", []):
+            return None
+        return _RequestProfiler(scope)
+
+class _RequestProfiler:
+    """Samples one request and writes an HTML report to PROFILE_DIR"""
+
+    def __init__(self, scope):
+        self.name = f"{time.strftime('%Y%m%dT%H%M%S')}-{scope['method']}-{uuid.uuid4().hex[:8]}.html"
+        #async_mode="enabled" only samples the request's own task, not others running on the loop
+        self._profiler = Profiler(interval=config.PROFILE_INTERVAL, async_mode="enabled")
+
+    def start(self):
+        self._profiler.start()
+
+    def stop(self):
+        self._profiler.stop()
+        os.makedirs(config.PROFILE_DIR, exist_ok=True)
+        with open(os.path.join(config.PROFILE_DIR, self.name), "w", encoding="utf-8") as stream:
+            stream.write(self._profiler.output_html())
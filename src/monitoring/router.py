@@ -0,0 +1,41 @@
+import secrets
+
+from fastapi import APIRouter, Header, Response, Security
+
+from ..auth import dependencies
+from ..auth.exceptions import credentials_exception
+from ..book import cache as book_cache, metadata_cache
+from ..database import pool_stats
+from . import config, metrics
+
+router = APIRouter(
+    prefix = "/monitoring",
+    tags = ["monitoring"],
+)
+
+#mounted at the root, where Prometheus scrapers look by default
+metrics_router = APIRouter(
+    tags = ["monitoring"],
+)
+
+@router.get(
+    "/pool",
+    dependencies=[
+        Security(dependencies.authorize_current_user, scopes=["admin", "superuser"]),
+    ])
+async def get_pool_stats():
+    return pool_stats()
+
+@router.get(
+    "/cache",
+    dependencies=[
+        Security(dependencies.authorize_current_user, scopes=["admin", "superuser"]),
+    ])
+async def get_cache_stats():
+    return {"openlibrary": metadata_cache.stats(), "book": book_cache.stats()}
+
+@metrics_router.get("/metrics", include_in_schema=False)
+async def get_metrics(authorization: str | None = Header(default=None)):
+    if config.METRICS_TOKEN and not secrets.compare_digest((authorization or "").encode(), f"Bearer {config.METRICS_TOKEN}".encode()):
+        raise credentials_exception("Invalid metrics token", "Bearer")
+    return Response(metrics.render(pools=pool_stats()), media_type="text/plain; version=0.0.4; charset=utf-8")
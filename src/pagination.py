@@ -0,0 +1,20 @@
+import base64
+import binascii
+import json
+
+"""Opaque keyset cursors: the sort key of the last row returned, tagged with the ordering it belongs to"""
+
+def encode_cursor(ordering: str, values: list) -> str:
+    payload = json.dumps({"o": ordering, "k": values}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+def decode_cursor(ordering: str, cursor: str) -> list:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError("Malformed cursor")
+
+    if not isinstance(payload, dict) or payload.get("o") != ordering or not isinstance(payload.get("k"), list):
+        raise ValueError("Cursor does not belong to this ordering")
+    return payload["k"]
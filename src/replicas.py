@@ -0,0 +1,144 @@
+import asyncio
+import contextvars
+import logging
+import time
+
+from fastapi import Request
+from sqlalchemy import event, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+from starlette.datastructures import MutableHeaders
+
+from . import config, database
+
+"""Routing of read-only endpoints to the read replicas in DB_REPLICA_URLS.
+
+Endpoints depending on get_read_db get a session on a healthy replica, round robin, and fall
+back to the primary when no replica is configured or reachable. A replica is dropped from the
+rotation when it fails a connection attempt or the periodic health check, and taken back once
+a check passes.
+
+Replicas lag behind the primary, so a client that has just written reads from the primary for
+DB_READ_YOUR_WRITES_SECONDS: ReadYourWritesMiddleware sets a cookie on successful responses of
+requests that committed a transaction on the primary, and get_read_db honours it. Clients without
+cookies get eventually consistent reads."""
+
+logger = logging.getLogger(__name__)
+
+#holds the unix time until which the client reads from the primary
+READ_PRIMARY_COOKIE = "read_primary_until"
+
+#[committed] for the current request, a mutable cell so commits made in nested contexts are seen
+_request_commits: contextvars.ContextVar[list[bool] | None] = contextvars.ContextVar("request_commits", default=None)
+
+@event.listens_for(Session, "after_commit")
+def _note_commit(session):
+    committed = _request_commits.get()
+    if committed is not None and not session.info.get("replica", False):
+        committed[0] = True
+
+def reads_own_writes(request: Request) -> bool:
+    try:
+        return float(request.cookies.get(READ_PRIMARY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+async def _replica_session():
+    replica_engine = database.choose_replica()
+    if replica_engine is None:
+        return None
+
+    #the session is marked so callers can tell possibly stale reads, e.g. to keep them out of caches
+    db = database.AsyncSessionLocal(bind=replica_engine, info={"replica": True})
+    try:
+        #connect up front, an unreachable replica then costs a fallback instead of a failed request
+        await db.connection()
+    except (DBAPIError, OSError):
+        logger.exception("Connecting to a read replica failed, reading from the primary")
+        database.mark_replica(replica_engine, healthy=False)
+        await db.close()
+        return None
+    return db
+
+async def get_read_db(request: Request):
+    """Session for read-only endpoints: a replica when one is healthy and the client has no recent write"""
+    db = None
+    if config.DB_REPLICA_URLS and not reads_own_writes(request):
+        db = await _replica_session()
+    if db is None:
+        database.get_async_engine()
+        db = database.AsyncSessionLocal()
+
+    async with db:
+        yield db
+
+async def _check(replica_engine):
+    async with replica_engine.connect() as connection:
+        await connection.execute(text("SELECT 1"))
+
+async def check_replicas():
+    for replica_engine in database.get_replica_engines():
+        try:
+            await asyncio.wait_for(_check(replica_engine), timeout=config.DB_REPLICA_CHECK_TIMEOUT)
+        except (DBAPIError, OSError, asyncio.TimeoutError):
+            database.mark_replica(replica_engine, healthy=False)
+        else:
+            database.mark_replica(replica_engine, healthy=True)
+
+class ReplicaMonitor:
+    """Runs check_replicas every DB_REPLICA_CHECK_INTERVAL seconds in a background task"""
+
+    def __init__(self, interval: float = config.DB_REPLICA_CHECK_INTERVAL):
+        self.interval = interval
+        self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await check_replicas()
+            except Exception:
+                logger.exception("Replica health check failed")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if config.DB_REPLICA_URLS and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+monitor = ReplicaMonitor()
+
+class ReadYourWritesMiddleware:
+    """Pins a client to the primary for DB_READ_YOUR_WRITES_SECONDS after each successful request that committed"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        committed = [False]
+        token = _request_commits.set(committed)
+
+        async def send_with_cookie(message):
+            if message["type"] == "http.response.start" and committed[0] and message["status"] < 400:
+                until = int(time.time()) + config.DB_READ_YOUR_WRITES_SECONDS
+                MutableHeaders(scope=message).append(
+                    "set-cookie",
+                    f"{READ_PRIMARY_COOKIE}={until}; Max-Age={config.DB_READ_YOUR_WRITES_SECONDS}; Path=/; HttpOnly; SameSite=Lax",
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_cookie)
+        finally:
+            _request_commits.reset(token)
@@ -0,0 +1,20 @@
+from fastapi.responses import JSONResponse, ORJSONResponse, Response
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+"""JSON responses without the response_model round trip.
+
+FastAPI validates a returned object against response_model again and walks the result with
+jsonable_encoder before encoding it; for pages of books that is most of the request's CPU time."""
+
+#default response class of the app, orjson is optional and the stdlib encoder the fallback
+DefaultResponse = ORJSONResponse if orjson is not None else JSONResponse
+
+def model_response(model: BaseModel, headers: dict | None = None, **dump_options) -> Response:
+    """Encode an already validated model with pydantic's compiled serializer, route handlers
+    returning a Response skip FastAPI's response_model validation and encoding"""
+    return Response(content=model.model_dump_json(**dump_options), media_type="application/json", headers=headers)
@@ -0,0 +1,35 @@
+from contextlib import contextmanager
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+"""Helpers for tests and benchmarks, e.g. pinning the number of queries an endpoint issues:
+
+    with assert_statement_count(get_async_engine(), 2):
+        client.get("/api/users/retrieve/a@b.c?include=borrowed_books", headers=headers)
+"""
+
+@contextmanager
+def count_statements(engine):
+    """Collect the SQL of every statement executed on engine inside the block"""
+    #events live on the sync engine wrapped by an AsyncEngine
+    target = engine.sync_engine if isinstance(engine, AsyncEngine) else engine
+    statements = []
+
+    def record(connection, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(target, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(target, "before_cursor_execute", record)
+
+@contextmanager
+def assert_statement_count(engine, expected: int):
+    with count_statements(engine) as statements:
+        yield statements
+
+    assert len(statements) == expected, (
+        f"expected {expected} SQL statements, got {len(statements)}:\n" + "\n".join(statements)
+    )
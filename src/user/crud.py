@@ -1,43 +1,84 @@
 from sqlalchemy import select
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, noload, raiseload, selectinload
 
 from ..auth import service
+from ..book import models as book_models
 from . import models, schemas
 
-def get_user_by_email(db: Session, email: str):
-    return db.execute(select(models.User).where(models.User.email == email)).scalars().first()
+#how User.borrowed_books is loaded, async sessions can't lazy load so every query picks one:
+#selectin: one extra IN query, best for collections; joined: single LEFT JOIN query, duplicates user columns per book;
+#raise: error on access, guards code that must not touch loans; noload: leave empty without querying.
+#the options are built per query, touching User.borrowed_books at import would configure the mappers before Book exists
+BORROWED_BOOKS_LOADERS = {
+    "selectin": selectinload,
+    "joined": joinedload,
+    "raise": raiseload,
+    "noload": noload,
+}
 
-def create_user(user: schemas.UserCreate, db: Session):
+async def get_user_by_email(db: AsyncSession, email: str, loader: str = "noload"):
+    statement = select(models.User).options(BORROWED_BOOKS_LOADERS[loader](models.User.borrowed_books)).where(models.User.email == email)
+    #unique() is required once a joined collection duplicates the user row
+    return (await db.execute(statement)).scalars().unique().first()
+
+async def get_user_version(db: AsyncSession, email: str):
+    """(id, version) of the user, or None, without loading the row"""
+    return (await db.execute(select(models.User.id, models.User.version).where(models.User.email == email))).first()
+
+async def get_borrowed_book_versions(db: AsyncSession, user_id: int):
+    statement = select(book_models.Book.id, book_models.Book.version).where(book_models.Book.user_id == user_id).order_by(book_models.Book.id)
+    return (await db.execute(statement)).all()
+
+async def create_user(user: schemas.UserCreate, db: AsyncSession):
     #hash password with passlib
-    user_hashed_password = service.hash_password(user.password)
+    user_hashed_password = await service.hash_password_async(user.password)
     #instantiate User model
-    db_user = models.User(email=user.email, name=user.name, age=user.age, hashed_password=user_hashed_password)
+    #a new user has no loans, initializing the collection avoids loading it for the response
+    db_user = models.User(email=user.email, name=user.name, age=user.age, hashed_password=user_hashed_password, borrowed_books=[])
 
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
 
     return db_user
 
-def update_user(db: Session, user: schemas.UserUpdate, email: str):
+async def update_user(db: AsyncSession, user: schemas.UserUpdate, email: str):
     #query user with user email
-    query_user = get_user_by_email(email=email, db=db)
+    query_user = await get_user_by_email(email=email, db=db)
     #turn user (pydantic model) into python dict
     #allow partial update with exclude_unset=True
     update_data = user.model_dump(exclude_unset=True)
 
+    #the model stores only the hash, never the plaintext password
+    if "password" in update_data:
+        update_data["hashed_password"] = await service.hash_password_async(update_data.pop("password"))
+
     for key, value in update_data.items():
         setattr(query_user, key, value)
 
-    db.commit()
-    db.refresh(query_user)
+    await db.commit()
 
     return query_user
 
-def delete_user(db: Session, email: str):
-    db_user = get_user_by_email(email=email, db=db)
+async def update_hashed_password(db: AsyncSession, db_user: models.User, hashed_password: str):
+    db_user.hashed_password = hashed_password
+    await db.commit()
+
+    return db_user
+
+async def delete_user(db: AsyncSession, email: str):
+    #the session nulls book.user_id for the user's loans on delete, so the collection has to be loaded.
+    #populate_existing: the router's existence check may already hold the user with an empty noload
+    #collection, which a plain selectin query would reuse without loading the loans
+    statement = (
+        select(models.User)
+        .options(selectinload(models.User.borrowed_books))
+        .where(models.User.email == email)
+        .execution_options(populate_existing=True)
+    )
+    db_user = (await db.execute(statement)).scalars().first()
 
-    db.delete(db_user)
-    db.commit()
+    await db.delete(db_user)
+    await db.commit()
 
-    return {"message": "User deleted successfully"}
\ No newline at end of file
+    return {"message": "User deleted successfully"}
@@ -1,23 +1,41 @@
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException, Security
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, Security
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.exc import StaleDataError
 
+from .. import etag
 from ..auth import dependencies
 from . import crud, schemas
-from ..database import get_db
+from ..database import get_async_db
+from ..replicas import get_read_db
 
 router = APIRouter(
     prefix = "/users",
 )
 
+#relations a client can ask to embed with ?include=
+USER_INCLUDES = {"borrowed_books"}
+
+def parse_include(include: str = Query("", description="comma separated relations to embed: borrowed_books")):
+    requested = {name.strip() for name in include.split(",") if name.strip()}
+    if requested - USER_INCLUDES:
+        raise HTTPException(status_code=400, detail=f"Unknown include: {', '.join(sorted(requested - USER_INCLUDES))}")
+    return requested
+
+async def make_user_etag(db: AsyncSession, user_id: int, version: int, include_books: bool):
+    #loans change without touching the user row, so they are part of the embedded representation's ETag
+    if include_books:
+        return etag.hash_etag(f"user-{user_id}-{version}", await crud.get_borrowed_book_versions(user_id=user_id, db=db))
+    return etag.make_etag("user", user_id, version)
+
 @router.post("/create", response_model=schemas.User)
-def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
+async def create_user(user: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
     # Check if user already existed
-    db_user = crud.get_user_by_email(email=user.email, db=db)
+    db_user = await crud.get_user_by_email(email=user.email, db=db)
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
-    return crud.create_user(user=user, db=db)
+    return await crud.create_user(user=user, db=db)
 
 @router.get(
     "/retrieve/{email}", 
@@ -26,11 +44,35 @@ def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
         Security(dependencies.authorize_current_user, scopes=["user", "admin", "superuser"]), 
         Depends(dependencies.confirm_user_authorization)
     ])
-def read_user(email: str, db: Session = Depends(get_db)):
-    db_user = crud.get_user_by_email(email=email, db=db)
+async def read_user(
+    email: str,
+    response: Response,
+    include: set[str] = Depends(parse_include),
+    if_none_match: str | None = Header(None),
+    db: AsyncSession = Depends(get_read_db)
+):
+    include_books = "borrowed_books" in include
+
+    #revalidation reads only versions: the user's, plus its loans' when they are embedded
+    if if_none_match:
+        user_version = await crud.get_user_version(email=email, db=db)
+        if user_version:
+            user_etag = await make_user_etag(db, *user_version, include_books=include_books)
+            if etag.matches(if_none_match, user_etag):
+                return etag.not_modified(user_etag)
+
+    #loans are fetched with one extra IN query only when asked for, otherwise not at all
+    db_user = await crud.get_user_by_email(email=email, db=db, loader="selectin" if include_books else "noload")
     if not db_user: 
         raise HTTPException(status_code=404, detail="Target user does not exist")
-    return db_user
+
+    user = schemas.User.model_validate(db_user)
+    if include_books:
+        response.headers["ETag"] = etag.hash_etag(f"user-{user.id}-{user.version}", sorted((book.id, book.version) for book in user.borrowed_books))
+    else:
+        user.borrowed_books = None
+        response.headers["ETag"] = etag.make_etag("user", user.id, user.version)
+    return user
 
 @router.patch(
     "/update/{email}", 
@@ -39,11 +81,14 @@ def read_user(email: str, db: Session = Depends(get_db)):
         Security(dependencies.authorize_current_user, scopes=["user", "admin", "superuser"]), 
         Depends(dependencies.confirm_user_authorization)
     ])
-def update_user(email: str, user: schemas.UserUpdate, db: Session = Depends(get_db)):
-    db_user = crud.get_user_by_email(email=email, db=db)
+async def update_user(email: str, user: schemas.UserUpdate, db: AsyncSession = Depends(get_async_db)):
+    db_user = await crud.get_user_by_email(email=email, db=db)
     if not db_user:
-        HTTPException(status_code=400, detail="Target user does not exist")
-    return crud.update_user(email=email, user=user, db=db)
+        raise HTTPException(status_code=400, detail="Target user does not exist")
+    try:
+        return await crud.update_user(email=email, user=user, db=db)
+    except StaleDataError:
+        raise HTTPException(status_code=409, detail="User was modified concurrently, retry the update")
 
 @router.delete(
     "/delete/{email}",     
@@ -51,9 +96,9 @@ def update_user(email: str, user: schemas.UserUpdate, db: Session = Depends(get_
         Security(dependencies.authorize_current_user, scopes=["user", "admin", "superuser"]), 
         Depends(dependencies.confirm_user_authorization)
     ])
-def delete_user(email: str, db: Session = Depends(get_db)):
-    db_user = crud.get_user_by_email(email=email, db=db)
+async def delete_user(email: str, db: AsyncSession = Depends(get_async_db)):
+    db_user = await crud.get_user_by_email(email=email, db=db)
     if not db_user:
-        HTTPException(status_code=400, detail="Target user does not exist")
-    return crud.delete_user(email=email, db=db)
+        raise HTTPException(status_code=400, detail="Target user does not exist")
+    return await crud.delete_user(email=email, db=db)
 
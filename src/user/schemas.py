@@ -1,7 +1,7 @@
 from datetime import date, datetime
 from enum import Enum
 
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from ..book import schemas
 
 class UserStatus(str, Enum):
@@ -20,11 +20,12 @@ class User(UserBase):
     is_active: bool
     is_borrower: bool
     is_member: bool
-    borrowed_books: list[schemas.Book]
+    #None unless the caller asked for it with include=borrowed_books
+    borrowed_books: list[schemas.Book] | None = None
     registered_date: date   
+    version: int
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 class UserCreate(UserBase):
     password: str
@@ -38,4 +39,8 @@ class UserUpdate(BaseModel):
 class JWTTokenData(BaseModel):
     email: str
     scope: str | None 
-    expire_date: datetime 
\ No newline at end of file
+    expire_date: datetime
+    #token id, the key of the revocation set
+    jti: str
+    #"access" or "refresh"
+    token_type: str 
\ No newline at end of file